@@ -1,5 +1,9 @@
 from website_folder import app
+from website_folder.python.engine.pool import pose_pool
+
+# Warm up the pose graphs when the web app starts, not whenever the package is
+# imported (batch workers and benchmarks import it too)
+pose_pool.warm_up()
 
 if __name__ == '__main__':
     app.run(debug=True)
-
@@ -22,5 +22,53 @@ app.config['MAIL_PASSWORD'] = 'xxxx xxxx xxxx xxxx'
 
 mail = Mail(app)
 
+# Pose graphs shared by all exercise sessions, warmed up by run.py
+app.config['POSE_POOL_SIZE'] = 4
+app.config['POSE_POOL_TIMEOUT'] = 5
+
+# Webcam exercise sessions run in the background, one at a time as there is
+# one camera and one window; this many more may wait their turn
+app.config['EXERCISE_JOB_QUEUE'] = 2
+
+# Sessions are ended after this long without a person in view, this long in
+# total, or this many camera reads in a row that failed
+app.config['SESSION_IDLE_TIMEOUT'] = 120
+app.config['SESSION_MAX_DURATION'] = 3600
+app.config['SESSION_MAX_READ_FAILURES'] = 30
+
+# The camera sessions read from: a device index, a stream URL, a video file or
+# a directory of images. Devices are asked for this size, rate and codec.
+app.config['CAMERA_SOURCE'] = 0
+app.config['CAMERA_WIDTH'] = 1280
+app.config['CAMERA_HEIGHT'] = 720
+app.config['CAMERA_FPS'] = 30
+app.config['CAMERA_FOURCC'] = 'MJPG'
+
+# Model for recognising the exercise being done, trained on landmark
+# recordings with 'python -m website_folder.python.engine.recognition train'.
+# Without one, sessions count the exercise they were started with.
+app.config['RECOGNITION_MODEL'] = None
+app.config['RECOGNITION_INTERVAL'] = 15
+
+# Webcam sessions save their annotated video here for trainers to review, at
+# this width and JPEG quality, dropping frames rather than slowing the session
+# when encoding falls behind. Without a directory, nothing is recorded.
+app.config['SESSION_VIDEO_DIR'] = None
+app.config['SESSION_VIDEO_WIDTH'] = 640
+app.config['SESSION_VIDEO_QUALITY'] = 75
+
+from website_folder.python.engine.jobs import jobs
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.recognition import recognition
+from website_folder.python.engine.sources import camera
+from website_folder.python.engine.video import session_video
+from website_folder.python.engine.watchdog import supervisor
+
+pose_pool.init_app(app)
+jobs.init_app(app)
+supervisor.init_app(app)
+camera.init_app(app)
+recognition.init_app(app)
+session_video.init_app(app)
 
 from website_folder import route
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+
+from website_folder.python.engine.landmarks import X, Y
+
+# Motion scoring and landmark tracking both work on a small grey copy of the frame
+TRACK_WIDTH = 192
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def small_gray(frame):
+    height, width = frame.shape[:2]
+    size = (TRACK_WIDTH, max(1, height * TRACK_WIDTH // width))
+    return cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+
+def motion_score(previous, current):
+    """
+    Mean absolute grey-level change between two small frames, 0-255.
+    """
+    return cv2.mean(cv2.absdiff(previous, current))[0]
+
+
+class KeyframeScheduler:
+    """
+    Decides which frames get a full pose.process. budget is the fraction of
+    frames the graph may run on: every frame earns budget credits and a
+    keyframe spends one. A keyframe is taken when the frame moved more than
+    threshold and there is credit for it, and always after max_gap tracked
+    frames in a row, so slow or still trainees cost little and fast movement
+    gets the inference it needs.
+    """
+    def __init__(self, budget=0.5, threshold=2.0, max_gap=6, burst=3.0):
+        self.budget = budget
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.burst = burst
+        self.credit = burst
+        self.gap = 0
+        self.frames = 0
+        self.keyframes = 0
+
+    def decide(self, score):
+        self.frames += 1
+        self.credit = min(self.credit + self.budget, self.burst)
+        # No score means there is no previous frame to compare with
+        if score is None or self.gap >= self.max_gap or score >= self.threshold and self.credit >= 1:
+            self.credit -= 1
+            self.gap = 0
+            self.keyframes += 1
+            return True
+        self.gap += 1
+        return False
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'inference_rate': self.keyframes / self.frames if self.frames else 0.0,
+        }
+
+
+class LandmarkTracker:
+    """
+    Carries the last keyframe's landmarks forward with pyramidal Lucas-Kanade
+    optical flow. Points the flow loses keep their previous position.
+    """
+    def __init__(self):
+        self.gray = None
+        self.points = None
+        self.visible = None
+
+    def reset(self, gray, points, visible):
+        self.gray = gray
+        self.points = None if points is None else points.copy()
+        self.visible = visible
+
+    def track(self, gray):
+        previous, self.gray = self.gray, gray
+        if self.points is None:
+            return None
+        height, width = gray.shape
+        scale = np.array([width, height], np.float32)
+        start = (self.points[:, [X, Y]] * scale).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, gray, start, None, **LK_PARAMS)
+        found = status.ravel() == 1
+        self.points[found, X:Y + 1] = moved.reshape(-1, 2)[found] / scale
+        return self.points.copy()
+
+
+class AdaptiveInference:
+    """
+    Runs pose inference, infer(frame) -> (pose_landmarks, points, visible),
+    only on the frames the scheduler picks and tracks the landmarks in
+    between. process() returns (pose_landmarks, points, visible, keyframe);
+    points is None when nobody is visible, and pose_landmarks is only there
+    for keyframes.
+    """
+    def __init__(self, infer, scheduler=None):
+        self.infer = infer
+        self.scheduler = scheduler or KeyframeScheduler()
+        self.tracker = LandmarkTracker()
+
+    def process(self, frame):
+        gray = small_gray(frame)
+        previous = self.tracker.gray
+        # An empty scene is only re-checked on motion or after max_gap frames,
+        # which is also how a trainee walking into view gets picked up
+        score = None if previous is None or previous.shape != gray.shape else motion_score(previous, gray)
+        if self.scheduler.decide(score):
+            pose_landmarks, points, visible = self.infer(frame)
+            self.tracker.reset(gray, points, visible)
+            return pose_landmarks, points, visible, True
+
+        points = self.tracker.track(gray)
+        return None, points, self.tracker.visible, False
+
+    def stats(self):
+        return self.scheduler.stats()
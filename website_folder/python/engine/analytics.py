@@ -0,0 +1,358 @@
+import math
+
+import numpy as np
+
+
+def last_index(mask, start=-1):
+    """
+    For every position, the latest index at or before it where mask is true,
+    or start when there is none.
+    """
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), start))
+
+
+def before(indices, start):
+    """
+    last_index() results shifted to the latest index strictly before each position.
+    """
+    return np.concatenate([[start], indices[:-1]])
+
+
+class RunningStats:
+    """
+    Count, mean, variance (Welford's method), min and max of a stream of
+    numbers in constant memory.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        # Angles come in as float32 scalars, which would keep the sums in float32
+        value = float(value)
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        """
+        add() every value of an array, in a few array operations.
+        """
+        values = np.asarray(values, np.float64)
+        if not values.size:
+            return
+        other = RunningStats()
+        other.count = len(values)
+        other.total = float(values.sum())
+        other.mean = other.total / other.count
+        other.m2 = float(np.square(values - other.mean).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Fold in another RunningStats, as if its values had been added here.
+        """
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class TrackAnalytics:
+    """
+    Per-rep aggregates of one Track. A rep runs from the last frame in the
+    'enter' position, to the frame that counts it (the first phase), then
+    from the last frame still in the 'count' position back to the enter
+    position (the second phase), so pauses at either end are not part of
+    either phase. Track.concentric says which phase is the lift.
+    """
+    def __init__(self, track, angle_names):
+        self.track = track
+        self.indices = sorted({index for index, _, _ in track.enter + track.count})
+        self.names = [angle_names[index] for index in self.indices]
+        self.started = None
+        self.counted = None
+        self.held = None
+        self.low = self.high = None
+        self.duration = RunningStats()
+        self.concentric = RunningStats()
+        self.eccentric = RunningStats()
+        self.tension = RunningStats()
+        self.ranges = {name: (RunningStats(), RunningStats(), RunningStats()) for name in self.names}
+
+    def update(self, angles, t, entered, in_count, counted):
+        values = [float(angles[index]) for index in self.indices]
+        if entered:
+            if self.counted is not None:
+                self.extend(values)
+                self.finish(t)
+            self.started = t
+            self.low = list(values)
+            self.high = list(values)
+            return
+        if self.started is None:
+            return
+        self.extend(values)
+        if counted:
+            self.counted = self.held = t
+        elif self.counted is not None and in_count:
+            self.held = t
+
+    def extend(self, values):
+        for i, value in enumerate(values):
+            if value < self.low[i]:
+                self.low[i] = value
+            elif value > self.high[i]:
+                self.high[i] = value
+
+    def finish(self, t):
+        first, second = self.counted - self.started, t - self.held
+        concentric, eccentric = (first, second) if self.track.concentric else (second, first)
+        self.duration.add(t - self.started)
+        self.concentric.add(concentric)
+        self.eccentric.add(eccentric)
+        self.tension.add(concentric + eccentric)
+        for name, low, high in zip(self.names, self.low, self.high):
+            lows, highs, ranges = self.ranges[name]
+            lows.add(low)
+            highs.add(high)
+            ranges.add(high - low)
+        self.counted = None
+
+    def update_many(self, angles, t, entered, in_count, counted):
+        """
+        update() for every row of a chunk of frames where somebody was
+        detected. Reps are found from where the enter, count and in-count
+        frames fall, and their extremes taken with one reduceat per chunk.
+        """
+        if not len(t):
+            return
+        values = angles[:, self.indices].astype(np.float64)
+        # A frame that both enters and counts only enters, as in update()
+        counted = counted & ~entered
+        # The rep carried in from the last chunk sits just before it: its
+        # start at -2 and its count at -1
+        no_start, no_count = -2 if self.started is not None else -4, -1 if self.counted is not None else -5
+        last_enter = last_index(entered, no_start)
+        last_count = last_index(counted, no_count)
+        last_held = last_index(in_count | counted, no_count)
+        previous_enter = before(last_enter, no_start)
+        previous_count = before(last_count, no_count)
+
+        # An enter frame after a count ends that rep, which started at the
+        # last enter before its count and was held to the last frame in the
+        # count position before the end
+        ends = np.flatnonzero(entered & (previous_count > previous_enter))
+        if ends.size:
+            counts = previous_count[ends]
+            starts = np.where(counts >= 0, previous_enter[np.maximum(counts, 0)], -2)
+            held = before(last_held, no_count)[ends]
+            self.finish_many(self.times(t, starts, self.started), self.times(t, counts, self.counted),
+                             self.times(t, held, self.held), t[ends], values, np.maximum(starts, 0), ends,
+                             carried=starts[0] < 0)
+
+        if last_enter[-1] >= 0:
+            self.started = float(t[last_enter[-1]])
+            self.low = values[last_enter[-1]:].min(axis=0).tolist()
+            self.high = values[last_enter[-1]:].max(axis=0).tolist()
+        elif self.started is not None:
+            self.low = np.minimum(self.low, values.min(axis=0)).tolist()
+            self.high = np.maximum(self.high, values.max(axis=0)).tolist()
+        if last_count[-1] > last_enter[-1]:
+            self.counted = self.times(t, last_count[-1:], self.counted)[0]
+            self.held = self.times(t, last_held[-1:], self.held)[0]
+        else:
+            self.counted = None
+
+    @staticmethod
+    def times(t, indices, carried):
+        """
+        Frame times at indices, with the carried time for the negative ones.
+        """
+        return np.where(indices >= 0, t[np.maximum(indices, 0)], np.nan if carried is None else carried)
+
+    def finish_many(self, started, counted, held, ended, values, first, last, carried):
+        """
+        finish() for many reps at once: their start, count, held and end
+        times, and the frames from first to last (inclusive) of each in
+        values. With carried, the first rep began in an earlier chunk.
+        """
+        first_phase, second_phase = counted - started, ended - held
+        concentric, eccentric = (first_phase, second_phase) if self.track.concentric else (second_phase, first_phase)
+        self.duration.add_many(ended - started)
+        self.concentric.add_many(concentric)
+        self.eccentric.add_many(eccentric)
+        self.tension.add_many(concentric + eccentric)
+
+        # reduceat over [first, last + 1) of every rep, reading every other
+        # result; a padding row keeps the last bound in range. Reps sharing an
+        # end and start frame make the bounds overlap, which reduceat allows.
+        padded = np.concatenate([values, values[-1:]])
+        bounds = np.stack([first, last + 1], axis=1).ravel()
+        lows = np.minimum.reduceat(padded, bounds)[::2]
+        highs = np.maximum.reduceat(padded, bounds)[::2]
+        if carried:
+            lows[0] = np.minimum(lows[0], self.low)
+            highs[0] = np.maximum(highs[0], self.high)
+        for i, name in enumerate(self.names):
+            low_stats, high_stats, range_stats = self.ranges[name]
+            low_stats.add_many(lows[:, i])
+            high_stats.add_many(highs[:, i])
+            range_stats.add_many(highs[:, i] - lows[:, i])
+
+    def report(self):
+        return {
+            'reps': self.duration.count,
+            # A counted rep that has not made it back to the start yet
+            'unfinished': self.counted is not None,
+            'duration': self.duration.summary(),
+            'concentric': self.concentric.summary(),
+            'eccentric': self.eccentric.summary(),
+            'time_under_tension': self.tension.total,
+            'angles': {name: {'min': lows.summary(), 'max': highs.summary(), 'range': ranges.summary()}
+                       for name, (lows, highs, ranges) in self.ranges.items()},
+        }
+
+
+class HoldAnalytics:
+    """
+    Aggregates of a 'hold' exercise: the separate holds and the joint angles
+    over every frame in position.
+    """
+    def __init__(self, spec):
+        self.names = spec.angle_names
+        self.angles = [RunningStats() for _ in self.names]
+        self.holds = RunningStats()
+        self.started = None
+        self.last_t = None
+
+    def update(self, angles, t, in_position):
+        if in_position:
+            if self.started is None:
+                self.started = t
+            self.last_t = t
+            for stats, value in zip(self.angles, angles):
+                stats.add(value)
+        elif self.started is not None:
+            self.finish()
+
+    def finish(self):
+        self.holds.add(self.last_t - self.started)
+        self.started = None
+
+    def update_many(self, angles, t, in_position):
+        """
+        update() for every frame of a chunk, with the holds found as the
+        runs of frames in position.
+        """
+        if not len(t):
+            return
+        for stats, column in zip(self.angles, angles[in_position].T):
+            stats.add_many(column)
+        carried = self.started is not None and in_position[0]
+        if self.started is not None and not in_position[0]:
+            self.finish()
+        starts = np.flatnonzero(in_position & ~before(in_position, carried))
+        ends = np.flatnonzero(in_position & ~np.append(in_position[1:], False))
+        began = t[starts]
+        if carried:
+            began = np.concatenate([[self.started], began])
+        if in_position[-1]:
+            # The last run is still going on
+            self.started, self.last_t = float(began[-1]), float(t[-1])
+            began, ends = began[:-1], ends[:-1]
+        else:
+            self.started = None
+        self.holds.add_many(t[ends] - began)
+
+    def report(self):
+        holds = RunningStats()
+        holds.merge(self.holds)
+        if self.started is not None:
+            # The hold still going on
+            holds.add(self.last_t - self.started)
+        return {
+            'holds': holds.summary(),
+            'time_under_tension': holds.total,
+            'angles': {name: stats.summary() for name, stats in zip(self.names, self.angles)},
+        }
+
+
+class RepAnalytics:
+    """
+    Tempo, range of motion and left/right symmetry of a RepCounter's
+    exercise, fed by the counter's stage transitions and kept as running
+    aggregates, so nothing is buffered per frame. report() is meant for the
+    end of a session. Symmetry compares the mean range of motion of each
+    left_/right_ pair of angles (their mean angle, for holds).
+    """
+    def __init__(self, spec):
+        self.spec = spec
+        self.holds = HoldAnalytics(spec) if spec.counting == 'hold' else None
+        self.tracks = {} if self.holds else {track.name: TrackAnalytics(track, spec.angle_names)
+                                             for track in spec.tracks}
+
+    def rep(self, track, angles, t, entered, in_count, counted):
+        self.tracks[track.name].update(angles, t, entered, in_count, counted)
+
+    def hold(self, angles, t, in_position):
+        self.holds.update(angles, t, in_position)
+
+    def rep_many(self, track, angles, t, valid, entered, in_count, counted):
+        """
+        rep() for every frame of a chunk where somebody was detected.
+        """
+        self.tracks[track.name].update_many(angles[valid], t[valid], entered[valid], in_count[valid],
+                                            counted[valid])
+
+    def hold_many(self, angles, t, in_position):
+        self.holds.update_many(angles, t, in_position)
+
+    def report(self):
+        if self.holds:
+            report = self.holds.report()
+            means = {name: stats for name, stats in zip(self.spec.angle_names, self.holds.angles)}
+        else:
+            report = {'tracks': {name: track.report() for name, track in self.tracks.items()}}
+            # Range of motion of every angle over the reps of all tracks measuring it
+            means = {}
+            for track in self.tracks.values():
+                for name, (_, _, ranges) in track.ranges.items():
+                    means.setdefault(name, RunningStats()).merge(ranges)
+        symmetry = {}
+        for name in self.spec.angle_names:
+            if name.startswith('left_') and 'right_' + name[5:] in means:
+                left, right = means[name], means['right_' + name[5:]]
+                if left.count and right.count:
+                    symmetry[name[5:]] = {'left': left.mean, 'right': right.mean,
+                                          'difference': left.mean - right.mean}
+        report['symmetry'] = symmetry
+        return report
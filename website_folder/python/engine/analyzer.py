@@ -0,0 +1,70 @@
+from website_folder.python.engine.adaptive import AdaptiveInference
+from website_folder.python.engine.buffers import RgbBuffer
+from website_folder.python.engine.gate import QualityGate
+from website_folder.python.engine.landmarks import LandmarkBuffer
+from website_folder.python.engine.roi import RegionOfInterest
+
+
+class FrameResult:
+    """
+    What one analysed frame produced. points is a private copy of the
+    landmark array, so it stays valid while later frames are analysed.
+    visible masks the landmarks confident enough to draw, and keyframe is
+    False when the landmarks were tracked instead of inferred (pose_landmarks
+    is then None).
+    """
+    def __init__(self, frame, t, pose_landmarks, points, angles, state, keyframe=True, visible=None):
+        self.frame = frame
+        self.t = t
+        self.pose_landmarks = pose_landmarks
+        self.points = points
+        self.angles = angles
+        self.state = state
+        self.keyframe = keyframe
+        self.visible = visible
+
+
+class FrameAnalyzer:
+    """
+    Pose inference and rep counting for a stream of BGR frames. With a
+    KeyframeScheduler, inference only runs on the frames it picks. With roi,
+    inference runs on a crop around the person found in the previous frame
+    (see RegionOfInterest). Only frames that pass the QualityGate are counted.
+    """
+    def __init__(self, pose, counter, scheduler=None, roi=True):
+        self.pose = pose
+        self.counter = counter
+        self.buffer = LandmarkBuffer()
+        self.rgb = RgbBuffer()
+        self.gate = QualityGate()
+        self.roi = RegionOfInterest(pose, self.buffer) if roi else None
+        self.adaptive = AdaptiveInference(self.infer, scheduler) if scheduler else None
+
+    def infer(self, frame):
+        if self.roi:
+            return self.roi.process(frame)
+        pose_landmarks = self.pose.process(self.rgb.convert(frame)).pose_landmarks
+        points = visible = None
+        if pose_landmarks:
+            points = self.buffer.fill(pose_landmarks).copy()
+            visible = self.buffer.visible()
+        return pose_landmarks, points, visible
+
+    def analyze(self, frame, t):
+        if self.adaptive:
+            pose_landmarks, points, visible, keyframe = self.adaptive.process(frame)
+        else:
+            pose_landmarks, points, visible = self.infer(frame)
+            keyframe = True
+        spec = self.counter.spec
+        angles = state = None
+        if self.gate.admit(spec, points):
+            try:
+                angles = spec.kernel(points).tolist()
+                state = self.counter.update(angles, t)
+            except Exception as e:
+                self.gate.failed(e)
+                angles = None
+        if state is None:
+            state = self.counter.update(None, t)
+        return FrameResult(frame, t, pose_landmarks, points, angles, state, keyframe, visible)
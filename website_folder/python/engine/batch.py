@@ -0,0 +1,209 @@
+"""
+Score recorded workout videos without a camera or a display.
+
+    python -m website_folder.python.engine.batch VIDEO_DIR --output report.json
+    python -m website_folder.python.engine.batch clip.mp4 --exercise pushup --target 10
+
+Each video is scored by the exercise given with --exercise, or else by the
+exercise its file name starts with (pushup-2024-05-01.mp4). With --record,
+the landmarks of every video are also kept as a recording (see recording.py)
+so thresholds can be tuned later without running MediaPipe again.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from website_folder.python.engine.adaptive import KeyframeScheduler
+from website_folder.python.engine.analyzer import FrameAnalyzer
+from website_folder.python.engine.buffers import FramePool
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.pipeline import Pipeline
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.recording import LandmarkRecorder
+from website_folder.python.engine.sources import open_source
+from website_folder.python.engine.specs import EXERCISES
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def exercise_for(path):
+    stem = os.path.basename(path).lower()
+    # Longest name first, so 'shoulder_press' is not taken for something shorter
+    for name in sorted(EXERCISES, key=len, reverse=True):
+        if stem.startswith(name):
+            return name
+    return None
+
+
+class ReportBuilder:
+    """
+    Collects rep timestamps and form violations from analysed frames.
+    """
+    def __init__(self, counter):
+        self.counter = counter
+        self.frame = 0
+        self.counts = dict(counter.counts)
+        self.reps = []
+        self.violations = []
+        self.open_violation = None
+        self.no_person = 0
+
+    def add(self, result):
+        state = result.state
+        for track, count in state['counts'].items():
+            if count > self.counts[track]:
+                self.reps.append({'track': track, 'count': count, 'frame': self.frame, 't': result.t})
+        self.counts = state['counts']
+        if result.points is None:
+            self.no_person += 1
+
+        # Consecutive frames with the same warning are reported as one range
+        message = state['form_message']
+        if self.open_violation and self.open_violation['message'] != message:
+            self.open_violation = None
+        if message:
+            if self.open_violation is None:
+                self.open_violation = {'message': message, 'start_frame': self.frame, 'start_t': result.t}
+                self.violations.append(self.open_violation)
+            self.open_violation['end_frame'] = self.frame
+            self.open_violation['end_t'] = result.t
+        self.frame += 1
+
+    def report(self):
+        state = self.counter.state()
+        return {
+            'counts': state['counts'],
+            'complete': state['complete'],
+            'frames': self.frame,
+            'frames_without_person': self.no_person,
+            'reps': self.reps,
+            'form_violations': self.violations,
+            'analytics': self.counter.analytics.report(),
+        }
+
+
+def score_video(path, exercise, target=None, record=None, budget=None):
+    """
+    Run one exercise over a video file or a directory of frame images and
+    return a JSON-ready report.
+    Every frame is analysed, timed by its position in the video rather than
+    the wall clock. Without a target the counter never completes and just counts.
+    record is a directory to save the video's landmarks to, and budget the
+    fraction of frames to run pose inference on (default all of them).
+    """
+    spec = EXERCISES[exercise]
+    counter = RepCounter(spec, float('inf') if target is None else target)
+    builder = ReportBuilder(counter)
+    scheduler = KeyframeScheduler(budget) if budget else None
+
+    # Every frame is kept, so up to two full queues plus one per stage are in flight
+    frames = FramePool(2 * 8 + 3)
+
+    def capture():
+        return frames.read(cap)
+
+    def clock():
+        return cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def collect(result):
+        builder.add(result)
+        if recorder:
+            recorder.add(result.points, result.t)
+
+    with pose_pool.checkout() as pose:
+        cap = open_source(path)
+        if not cap.isOpened():
+            raise IOError("Cannot open video %s" % path)
+        recorder = LandmarkRecorder(record, video=path, exercise=exercise) if record else None
+        try:
+            analyzer = FrameAnalyzer(pose, counter, scheduler)
+            pipeline = Pipeline(capture, analyzer.analyze, collect,
+                                queue_size=8, drop=False, clock=clock, recycle=frames.release).run()
+            source_fps = cap.get(cv2.CAP_PROP_FPS)
+        finally:
+            cap.release()
+            if recorder:
+                recorder.close()
+
+    report = builder.report()
+    report.update({
+        'video': path,
+        'exercise': exercise,
+        'target': target,
+        'source_fps': source_fps,
+        'pipeline': pipeline,
+        'capture': cap.report(),
+        'quality': analyzer.gate.stats(),
+    })
+    if record:
+        report['recording'] = record
+    if scheduler:
+        report['inference'] = scheduler.stats()
+    return report
+
+
+def init_worker():
+    # One Pose graph per worker process, reused for every video it scores
+    pose_pool.size = 1
+    pose_pool.warm_up()
+
+
+def score_job(job):
+    path, exercise, target, record, budget = job
+    try:
+        return score_video(path, exercise, target, record, budget)
+    except Exception as e:
+        return {'video': path, 'exercise': exercise, 'error': '%s: %s' % (type(e).__name__, e)}
+
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help="video files or directories of videos")
+    parser.add_argument('--exercise', choices=sorted(EXERCISES))
+    parser.add_argument('--target', type=int, help="reps (or plank seconds) that complete the exercise")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help="report file, default stdout")
+    parser.add_argument('--record', metavar='DIR', help="save each video's landmarks under DIR")
+    parser.add_argument('--budget', type=float, help="fraction of frames to run pose inference on, e.g. 0.5")
+    args = parser.parse_args()
+
+    jobs = []
+    for path in find_videos(args.paths):
+        exercise = args.exercise or exercise_for(path)
+        if exercise is None:
+            print("Skipping %s: no --exercise and no exercise in its name" % path, file=sys.stderr)
+            continue
+        record = None
+        if args.record:
+            name = os.path.splitext(os.path.basename(path))[0]
+            record = os.path.join(args.record, name + '.landmarks')
+        jobs.append((path, exercise, args.target, record, args.budget))
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        reports = list(executor.map(score_job, jobs))
+
+    output = json.dumps({'videos': reports}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
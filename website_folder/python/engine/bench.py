@@ -0,0 +1,818 @@
+"""
+Micro-benchmarks for the exercise engine.
+
+    python -m website_folder.python.engine.bench angles
+    python -m website_folder.python.engine.bench --json bench.json pipeline --video squat.mp4
+    python -m website_folder.python.engine.bench adaptive --video squat.mp4 --exercise squat
+    python -m website_folder.python.engine.bench hud
+    python -m website_folder.python.engine.bench skeleton
+    python -m website_folder.python.engine.bench people --video squat.mp4
+    python -m website_folder.python.engine.bench roi --video squat.mp4
+    python -m website_folder.python.engine.bench buffers --video squat.mp4
+    python -m website_folder.python.engine.bench recognize --video squat.mp4
+    python -m website_folder.python.engine.bench counting --frames 1000000
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from website_folder.python.engine.adaptive import KeyframeScheduler
+from website_folder.python.engine.analyzer import FrameAnalyzer
+from website_folder.python.engine.buffers import FramePool
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.gate import QualityGate
+from website_folder.python.engine.hud import HudCompositor
+from website_folder.python.engine.landmarks import LANDMARK_NAMES, NUM_LANDMARKS, LandmarkBuffer, calculate_angle
+from website_folder.python.engine.multiperson import HogDetector, MultiPersonAnalyzer
+from website_folder.python.engine.overlay import (CONNECTION_SPEC, LANDMARK_SPEC, SKELETON, draw_angle_labels,
+                                                  draw_banner, draw_overlay, draw_status, mp_drawing)
+from website_folder.python.engine.pipeline import Pipeline
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.recognition import NUM_FEATURES, ExerciseClassifier, ExerciseRecognizer
+from website_folder.python.engine.session import decode_jpeg
+from website_folder.python.engine.specs import EXERCISES
+from website_folder.python.engine.synthetic import generate
+from website_folder.python.engine.timing import StageTimer
+
+mp_pose = mp.solutions.pose
+
+
+def synthetic_landmarks(seed=0):
+    rng = np.random.default_rng(seed)
+    pose_landmarks = landmark_pb2.NormalizedLandmarkList()
+    for _ in range(NUM_LANDMARKS):
+        landmark = pose_landmarks.landmark.add()
+        landmark.x, landmark.y = rng.uniform(0.2, 0.8, 2)
+        landmark.z = rng.uniform(-0.5, 0.5)
+        landmark.visibility = landmark.presence = rng.uniform(0.5, 1.0)
+    return pose_landmarks
+
+
+def time_per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def bench_angles(args):
+    """
+    Per-frame cost of turning pose_landmarks into a spec's joint angles:
+    the old per-joint lists + calculate_angle against LandmarkBuffer + AngleKernel.
+    """
+    pose_landmarks = synthetic_landmarks()
+    buffer = LandmarkBuffer()
+    report = {}
+    for name, spec in EXERCISES.items():
+        joints = [[getattr(mp_pose.PoseLandmark, LANDMARK_NAMES[i]) for i in triplet] for triplet in spec.triplets]
+
+        # What every exercise module used to do: one list per joint, one calculate_angle per angle
+        def before():
+            landmarks = pose_landmarks.landmark
+            return [calculate_angle(*[[landmarks[joint.value].x, landmarks[joint.value].y] for joint in triplet])
+                    for triplet in joints]
+
+        def after():
+            return spec.kernel(buffer.fill(pose_landmarks)).tolist()
+
+        assert np.allclose(before(), after(), atol=1e-3)
+        report[name] = {
+            'angles': len(spec.triplets),
+            'before_us': time_per_call(before, args.number),
+            'after_us': time_per_call(after, args.number),
+        }
+        print("%-15s %d angles  before %7.1f us  after %7.1f us" % (
+            name, report[name]['angles'], report[name]['before_us'], report[name]['after_us']))
+    return report
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'mediapipe': mp.__version__,
+    }
+
+
+def load_clip(args):
+    """
+    The benchmark input as JPEG payloads, the way clients push frames: the
+    first --frames frames of --video, or synthetic noise frames.
+    """
+    width, height = args.size
+    frames = []
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, (width, height)))
+        cap.release()
+        if not frames:
+            raise SystemExit("Cannot read frames from %s" % args.video)
+    else:
+        rng = np.random.default_rng(0)
+        background = rng.integers(0, 256, (height, width, 3), np.uint8)
+        for i in range(args.frames):
+            frames.append(np.roll(background, 4 * i, axis=1))
+    return [cv2.imencode('.jpg', frame)[1].tobytes() for frame in frames]
+
+
+def run_stages(spec, clip, pose):
+    """
+    One pass over the clip doing what a pushed frame costs the server, with
+    every stage timed on its own. Frames where nobody is detected are drawn
+    with synthetic landmarks, so the drawing stages always do real work.
+    """
+    timers = {name: StageTimer(len(clip)) for name in
+              ('decode', 'color', 'pose', 'angles', 'count', 'skeleton', 'overlay', 'encode')}
+    counter = RepCounter(spec, float('inf'))
+    buffer = LandmarkBuffer()
+    hud = HudCompositor(spec)
+    fallback = synthetic_landmarks()
+    started = time.perf_counter()
+    for i, data in enumerate(clip):
+        start = time.perf_counter()
+        frame = decode_jpeg(data)
+        timers['decode'].since(start)
+
+        start = time.perf_counter()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        timers['color'].since(start)
+
+        start = time.perf_counter()
+        results = pose.process(rgb)
+        timers['pose'].since(start)
+
+        pose_landmarks = results.pose_landmarks or fallback
+        start = time.perf_counter()
+        points = buffer.fill(pose_landmarks)
+        angles = spec.kernel(points).tolist()
+        timers['angles'].since(start)
+
+        start = time.perf_counter()
+        state = counter.update(angles, i / 30.0)
+        timers['count'].since(start)
+
+        start = time.perf_counter()
+        SKELETON.draw(frame, points, buffer.visible())
+        timers['skeleton'].since(start)
+
+        start = time.perf_counter()
+        draw_angle_labels(frame, spec, points, angles)
+        hud.draw_status(frame, state)
+        hud.draw_banner(frame, spec.complete_message, cv2.FONT_HERSHEY_TRIPLEX, (0, 255, 0))
+        timers['overlay'].since(start)
+
+        # Headless stand-in for cv2.imshow: what sending the frame back would cost
+        start = time.perf_counter()
+        cv2.imencode('.jpg', frame)
+        timers['encode'].since(start)
+    elapsed = time.perf_counter() - started
+    return {name: timer.summary() for name, timer in timers.items()}, len(clip) / elapsed
+
+
+def run_pipelined(spec, clip, pose):
+    """
+    End-to-end rate of the same work through the threaded capture/inference/render Pipeline.
+    """
+    frames = iter(clip)
+    counter = RepCounter(spec, float('inf'))
+    hud = HudCompositor(spec)
+
+    def capture():
+        data = next(frames, None)
+        return None if data is None else decode_jpeg(data)
+
+    def render(result):
+        draw_overlay(result.frame, spec, result.state, result.points, result.visible, result.angles, hud)
+        cv2.imencode('.jpg', result.frame)
+
+    return Pipeline(capture, FrameAnalyzer(pose, counter).analyze, render, queue_size=4, drop=False).run()
+
+
+def bench_pipeline(args):
+    """
+    Per-stage latency (p50/p95/p99) and end-to-end frames per second of every
+    exercise over a fixed clip, sequentially and through the threaded pipeline.
+    """
+    clip = load_clip(args)
+    report = {
+        'environment': environment(),
+        'source': args.video or 'synthetic',
+        'frames': len(clip),
+        'size': list(args.size),
+        'exercises': {},
+    }
+    pose_pool.size = 1
+    with pose_pool.checkout() as pose:
+        for name in args.exercise or sorted(EXERCISES):
+            spec = EXERCISES[name]
+            stages, fps = run_stages(spec, clip, pose)
+            pipelined = run_pipelined(spec, clip, pose)
+            report['exercises'][name] = {'stages': stages, 'fps': fps, 'pipelined_fps': pipelined['fps']}
+
+            print("%s: %.1f fps sequential, %.1f fps pipelined" % (name, fps, pipelined['fps']))
+            for stage, summary in stages.items():
+                print("  %-15s p50 %7.2f ms  p95 %7.2f ms  p99 %7.2f ms" % (
+                    stage, summary['p50_ms'], summary['p95_ms'], summary['p99_ms']))
+    return report
+
+
+def analyze_clip(spec, frames, pose, scheduler=None, roi=True):
+    """
+    Landmarks, rep frames and inference time of one pass over decoded frames.
+    """
+    pose.reset()
+    counter = RepCounter(spec, float('inf'))
+    analyzer = FrameAnalyzer(pose, counter, scheduler, roi)
+    points, reps, counts = [], [], dict(counter.counts)
+    started = time.perf_counter()
+    for i, frame in enumerate(frames):
+        result = analyzer.analyze(frame, i / 30.0)
+        points.append(result.points)
+        for track, count in result.state['counts'].items():
+            if count > counts[track]:
+                reps.append(i)
+        counts = result.state['counts']
+    elapsed = time.perf_counter() - started
+    report = {'points': points, 'reps': reps, 'counts': counts, 'ms_per_frame': elapsed / len(frames) * 1000}
+    if analyzer.roi:
+        report['roi'] = analyzer.roi.stats()
+    return report
+
+
+def bench_adaptive(args):
+    """
+    Keyframe scheduling against full-rate inference on a recorded clip:
+    inference rate and cost, rep count and timing differences, and how far
+    tracked landmarks drift from the ones inference would have given.
+    """
+    frames = [decode_jpeg(data) for data in load_clip(args)]
+    spec = EXERCISES[args.exercise]
+    report = {'source': args.video or 'synthetic', 'frames': len(frames), 'exercise': args.exercise, 'budgets': {}}
+    pose_pool.size = 1
+    with pose_pool.checkout() as pose:
+        full = analyze_clip(spec, frames, pose)
+        report['full'] = {'counts': full['counts'], 'ms_per_frame': full['ms_per_frame']}
+        print("full rate: %s, %.1f ms/frame" % (full['counts'], full['ms_per_frame']))
+
+        for budget in args.budget:
+            scheduler = KeyframeScheduler(budget=budget, threshold=args.threshold, max_gap=args.max_gap)
+            run = analyze_clip(spec, frames, pose, scheduler)
+            errors = [np.abs(a[:, :2] - b[:, :2]).mean() for a, b in zip(full['points'], run['points'])
+                      if a is not None and b is not None]
+            # Each full-rate rep matched to the nearest adaptive one
+            offsets = [min(abs(rep - other) for other in run['reps']) for rep in full['reps']] if run['reps'] else []
+            report['budgets'][budget] = result = {
+                'inference_rate': scheduler.stats()['inference_rate'],
+                'ms_per_frame': run['ms_per_frame'],
+                'counts': run['counts'],
+                'count_error': sum(abs(run['counts'][k] - full['counts'][k]) for k in full['counts']),
+                'rep_offset_frames_mean': float(np.mean(offsets)) if offsets else None,
+                'landmark_error_mean': float(np.mean(errors)) if errors else None,
+            }
+            print("budget %.2f: %.0f%% keyframes, %.1f ms/frame, counts %s, landmark error %s" % (
+                budget, result['inference_rate'] * 100, result['ms_per_frame'], result['counts'],
+                result['landmark_error_mean']))
+    return report
+
+
+def hud_states(spec, frames, rep_every):
+    """
+    Counter states for a clip where a rep lands every rep_every frames and the
+    form warning shows for a third of the time.
+    """
+    states = []
+    for i in range(frames):
+        reps = i // rep_every
+        state = {
+            'counts': {track.name: reps for track in spec.tracks},
+            'form_message': "FORM INCORRECT!" if i % (3 * rep_every) < rep_every else None,
+            'complete': reps >= 10,
+        }
+        if spec.counting == 'hold':
+            state['remaining'] = max(30 - reps, 0)
+        states.append(state)
+    return states
+
+
+def bench_hud(args):
+    """
+    Status boxes and banners drawn from scratch every frame against copied
+    from HudCompositor's cache, per exercise.
+    """
+    width, height = args.size
+    background = np.random.default_rng(0).integers(0, 256, (height, width, 3), np.uint8)
+    report = {}
+    for name, spec in EXERCISES.items():
+        states = hud_states(spec, args.frames, args.rep_every)
+        hud = HudCompositor(spec)
+
+        def draw(state, frame):
+            if state['form_message']:
+                draw_banner(frame, state['form_message'], cv2.FONT_HERSHEY_SIMPLEX, (0, 0, 255))
+            draw_status(frame, spec, state)
+            if state['complete']:
+                draw_banner(frame, spec.complete_message, cv2.FONT_HERSHEY_TRIPLEX, (0, 255, 0))
+
+        def composite(state, frame):
+            if state['form_message']:
+                hud.draw_banner(frame, state['form_message'], cv2.FONT_HERSHEY_SIMPLEX, (0, 0, 255))
+            hud.draw_status(frame, state)
+            if state['complete']:
+                hud.draw_banner(frame, spec.complete_message, cv2.FONT_HERSHEY_TRIPLEX, (0, 255, 0))
+
+        for state in states[::args.rep_every]:
+            expected, actual = background.copy(), background.copy()
+            draw(state, expected)
+            composite(state, actual)
+            assert np.array_equal(expected, actual), name
+
+        frames = [background.copy() for _ in range(8)]
+
+        def run(fn):
+            def clip():
+                for i, state in enumerate(states):
+                    fn(state, frames[i % len(frames)])
+            return clip
+
+        hud = HudCompositor(spec)
+        report[name] = {
+            'before_us': time_per_call(run(draw), 1) / len(states),
+            'after_us': time_per_call(run(composite), 1) / len(states),
+        }
+        report[name].update(hud.stats())
+        print("%-15s before %6.1f us/frame  after %6.1f us/frame  (%d renders)" % (
+            name, report[name]['before_us'], report[name]['after_us'], hud.renders))
+    return report
+
+
+def bench_skeleton(args):
+    """
+    mp_drawing.draw_landmarks against SkeletonRenderer on the same landmarks,
+    checking that both draw exactly the same pixels.
+    """
+    width, height = args.size
+    background = np.random.default_rng(0).integers(0, 256, (height, width, 3), np.uint8)
+    buffer = LandmarkBuffer()
+    cases = []
+    for seed in range(args.poses):
+        pose_landmarks = synthetic_landmarks(seed)
+        points = buffer.fill(pose_landmarks).copy()
+        cases.append((pose_landmarks, points, buffer.visible()))
+
+        expected, actual = background.copy(), background.copy()
+        mp_drawing.draw_landmarks(expected, pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS,
+                                  LANDMARK_SPEC, CONNECTION_SPEC)
+        SKELETON.draw(actual, points, cases[-1][2])
+        assert np.array_equal(expected, actual), seed
+
+    frame = background.copy()
+
+    def before():
+        for pose_landmarks, _, _ in cases:
+            mp_drawing.draw_landmarks(frame, pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS,
+                                      LANDMARK_SPEC, CONNECTION_SPEC)
+
+    def after():
+        for _, points, visible in cases:
+            SKELETON.draw(frame, points, visible)
+
+    report = {
+        'poses': len(cases),
+        'before_us': time_per_call(before, args.number) / len(cases),
+        'after_us': time_per_call(after, args.number) / len(cases),
+    }
+    print("draw_landmarks %.1f us/frame  SkeletonRenderer %.1f us/frame" % (report['before_us'], report['after_us']))
+    return report
+
+
+def figure_clip(frames, size):
+    """
+    A person squatting every 15 frames, cut from the squat figures of the
+    exercise page, for machines without a recorded clip.
+    """
+    width, height = size
+    image = cv2.imread(os.path.join(os.path.dirname(__file__), '..', '..', 'static', 'squats.jpeg'))
+    poses = []
+    for figure in (image[40:360, 20:140], image[40:360, 180:380]):
+        tile = np.full((height, width, 3), 255, np.uint8)
+        scale = min(width / figure.shape[1], 0.85 * height / figure.shape[0])
+        figure = cv2.resize(figure, None, fx=scale, fy=scale)
+        y, x = (height - figure.shape[0]) // 2, (width - figure.shape[1]) // 2
+        tile[y:y + figure.shape[0], x:x + figure.shape[1]] = figure
+        poses.append(tile)
+    return [poses[(i // 15) % 2] for i in range(frames)]
+
+
+def settle_pool():
+    # Graphs given back to the pool are recycled in the background
+    while pose_pool.idle.qsize() < pose_pool.created:
+        time.sleep(0.01)
+
+
+def bench_people(args):
+    """
+    Multi-person frame rate against the number of people in view, with the
+    person crops processed sequentially and concurrently. The scene is the
+    clip of one person repeated side by side, each copy a few frames apart.
+    """
+    width, height = args.size
+    if args.video:
+        clip = [decode_jpeg(data) for data in load_clip(args)]
+    else:
+        clip = figure_clip(args.frames, args.size)
+    spec = EXERCISES[args.exercise]
+    report = {'environment': environment(), 'source': args.video or 'figures', 'frames': len(clip),
+              'person_size': [width, height], 'people': {}}
+    pose_pool.size = max(args.people)
+    pose_pool.warm_up()
+    for people in args.people:
+        scene = [np.hstack([clip[(i + 7 * k) % len(clip)] for k in range(people)]) for i in range(len(clip))]
+        report['people'][people] = result = {}
+        for mode, workers in (('sequential', 1), ('concurrent', people)):
+            settle_pool()
+            analyzer = MultiPersonAnalyzer(spec, float('inf'), detector=HogDetector(args.detect_width),
+                                           max_people=people, detect_interval=args.detect_interval,
+                                           workers=workers)
+            started = time.perf_counter()
+            tracked = 0
+            for i, frame in enumerate(scene):
+                tracked += len(analyzer.analyze(frame.copy(), i / 30.0).people)
+            elapsed = time.perf_counter() - started
+            analyzer.close()
+            result[mode] = {
+                'fps': len(scene) / elapsed,
+                'ms_per_frame': elapsed / len(scene) * 1000,
+                'tracked_mean': tracked / len(scene),
+                'detections': analyzer.detections,
+                'counts': [sum(state['counts'].values()) for state in analyzer.people().values()],
+            }
+        print("%d people: %.1f fps sequential, %.1f fps concurrent, %.1f tracked on average" % (
+            people, result['sequential']['fps'], result['concurrent']['fps'], result['concurrent']['tracked_mean']))
+    settle_pool()
+    return report
+
+
+def bench_roi(args):
+    """
+    Pose inference on a crop around the previous frame's skeleton against the
+    whole frame: time per frame, share of the frame sent to the graph, and
+    how far the landmarks and rep counts move.
+    """
+    width, height = args.size
+    if args.video:
+        frames = [decode_jpeg(data) for data in load_clip(args)]
+    else:
+        # The squat figure drifting across a wider frame
+        frames = []
+        for i, tile in enumerate(figure_clip(args.frames, (width // 4, height * 2 // 3))):
+            frame = np.full((height, width, 3), 96, np.uint8)
+            x = int((width - tile.shape[1]) * (0.5 + 0.4 * np.sin(i / 40.0)))
+            y = (height - tile.shape[0]) // 2
+            frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+            frames.append(frame)
+    spec = EXERCISES[args.exercise]
+    report = {'environment': environment(), 'source': args.video or 'figures', 'frames': len(frames),
+              'size': [width, height]}
+    pose_pool.size = 1
+    with pose_pool.checkout() as pose:
+        full = analyze_clip(spec, frames, pose, roi=False)
+        cropped = analyze_clip(spec, frames, pose)
+    errors = [np.abs(a[:, :2] - b[:, :2]).mean() for a, b in zip(full['points'], cropped['points'])
+              if a is not None and b is not None]
+    report['full'] = {'ms_per_frame': full['ms_per_frame'], 'counts': full['counts'],
+                      'detected': sum(p is not None for p in full['points'])}
+    report['roi'] = dict(cropped['roi'], ms_per_frame=cropped['ms_per_frame'], counts=cropped['counts'],
+                         detected=sum(p is not None for p in cropped['points']),
+                         landmark_error_mean=float(np.mean(errors)) if errors else None)
+    print("full frame: %.1f ms/frame, counts %s" % (full['ms_per_frame'], full['counts']))
+    print("roi: %.1f ms/frame, counts %s, %.0f%% cropped, %.0f%% of the pixels, landmark error %s" % (
+        cropped['ms_per_frame'], cropped['counts'], cropped['roi']['cropped_rate'] * 100,
+        cropped['roi']['pixels_mean'] * 100, report['roi']['landmark_error_mean']))
+    return report
+
+
+def bench_buffers(args):
+    """
+    Bytes allocated per frame in steady state, measured with tracemalloc,
+    for capture, analysis and overlay drawing with cap.read() allocating
+    every frame against reading into a FramePool.
+    """
+    path = args.video
+    if path is None:
+        # cap.read(buffer) needs a real capture, so write the figure clip out
+        path = os.path.join(tempfile.mkdtemp(), 'figures.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, args.size)
+        for frame in figure_clip(args.frames, args.size):
+            writer.write(frame)
+        writer.release()
+    spec = EXERCISES[args.exercise]
+    report = {'environment': environment(), 'source': args.video or 'figures', 'modes': {}}
+    pose_pool.size = 1
+    with pose_pool.checkout() as pose:
+        for mode in ('allocating', 'pooled'):
+            counter = RepCounter(spec, float('inf'))
+            analyzer = FrameAnalyzer(pose, counter)
+            hud = HudCompositor(spec)
+            frames = FramePool()
+            cap = cv2.VideoCapture(path)
+            transient, retained = [], []
+            tracemalloc.start()
+            for i in range(args.frames):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                if mode == 'pooled':
+                    frame = frames.read(cap)
+                else:
+                    frame = cap.read()[1]
+                if frame is None:
+                    break
+                result = analyzer.analyze(frame, i / 30.0)
+                draw_overlay(frame, spec, result.state, result.points, result.visible, result.angles, hud)
+                if mode == 'pooled':
+                    frames.release(frame)
+                del frame, result
+                current, peak = tracemalloc.get_traced_memory()
+                # The first frames allocate the buffers that are reused afterwards
+                if i >= args.warm_up:
+                    transient.append(peak - before)
+                    retained.append(current - before)
+            tracemalloc.stop()
+            cap.release()
+            report['modes'][mode] = result = {
+                'frames': len(transient),
+                'peak_kb_mean': float(np.mean(transient)) / 1024,
+                # Typical frame, without the HUD layers rendered when a count changes
+                'peak_kb_p50': float(np.median(transient)) / 1024,
+                'peak_kb_max': float(np.max(transient)) / 1024,
+                'retained_kb_total': float(np.sum(retained)) / 1024,
+            }
+            if mode == 'pooled':
+                result.update(frames.stats())
+            print("%-10s %8.1f KB/frame peak (median %.1f, max %.1f), %.1f KB retained over %d frames" % (
+                mode, result['peak_kb_mean'], result['peak_kb_p50'], result['peak_kb_max'], result['retained_kb_total'],
+                result['frames']))
+    return report
+
+
+def bench_recognize(args):
+    """
+    Cost of exercise recognition per frame next to that of pose inference on
+    the same frames, checked against a share of the inference time. The
+    model is random windows for every exercise, as many as a trained one
+    keeps, since only its size matters for speed.
+    """
+    if args.video:
+        frames = [decode_jpeg(data) for data in load_clip(args)]
+    else:
+        frames = figure_clip(args.frames, args.size)
+    spec = EXERCISES[args.exercise]
+    pose_pool.size = 1
+    with pose_pool.checkout() as pose:
+        inference = analyze_clip(spec, frames, pose)
+
+    rng = np.random.default_rng(0)
+    names = sorted(EXERCISES)
+    windows = rng.normal(size=(len(names) * args.max_per_class, 2 * NUM_FEATURES))
+    classifier = ExerciseClassifier(max_per_class=args.max_per_class).fit(
+        windows, np.repeat(names, args.max_per_class))
+    recognizer = ExerciseRecognizer(classifier, interval=args.interval)
+    started = time.perf_counter()
+    for points in inference['points']:
+        recognizer.add(points)
+    elapsed = time.perf_counter() - started
+
+    ms_per_frame = elapsed / len(frames) * 1000
+    share = ms_per_frame / inference['ms_per_frame']
+    report = {
+        'environment': environment(),
+        'source': args.video or 'figures',
+        'frames': len(frames),
+        'model_windows': len(classifier.windows),
+        'inference_ms_per_frame': inference['ms_per_frame'],
+        'recognition_ms_per_frame': ms_per_frame,
+        'share': share,
+        'budget': args.budget,
+        'within_budget': share <= args.budget,
+        'timings': recognizer.stats()['timings'],
+    }
+    print("pose inference %.2f ms/frame, recognition %.3f ms/frame (%.2f%%, budget %.2f%%)" % (
+        inference['ms_per_frame'], ms_per_frame, share * 100, args.budget * 100))
+    return report
+
+
+def report_difference(a, b, path='', tolerance=1e-9):
+    """
+    Path to the first value where two reports differ beyond tolerance, or None.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in sorted(set(a) | set(b), key=str):
+            difference = report_difference(a.get(key), b.get(key), '%s/%s' % (path, key), tolerance)
+            if difference:
+                return difference
+        return None
+    if isinstance(a, float) and isinstance(b, float):
+        return None if math.isclose(a, b, rel_tol=tolerance, abs_tol=tolerance) else path
+    return None if a == b else path
+
+
+def bench_counting(args):
+    """
+    Rep counting over generated landmark sequences with partial reps, bad
+    form and dropped frames, no video needed: throughput of generating,
+    measuring angles and counting (whole chunks with update_many(), and a
+    sample frame by frame with update()), and whether every sequence counts
+    what it should and raises the warnings it should. The sample's rep
+    analytics must also match those of update_many().
+    """
+    report = {'environment': environment(), 'exercises': {}, 'correct': True}
+    for name in args.exercise or sorted(EXERCISES):
+        spec = EXERCISES[name]
+        timers = {stage: StageTimer() for stage in ('generate', 'angles', 'update_many', 'update')}
+        frames = per_frame = 0
+        gate = QualityGate()
+        mismatches = []
+        seed = 0
+        while frames < args.frames:
+            started = time.perf_counter()
+            sequence = generate(name, args.reps, args.fps, seed, args.noise, args.dropout, args.partial, args.bad)
+            timers['generate'].since(started)
+            started = time.perf_counter()
+            angles = spec.kernel(sequence.points)
+            timers['angles'].since(started)
+            # Admitted as live and recorded frames are, so the counts are the ones they would give
+            valid = gate.admit_many(spec, sequence.points, sequence.valid)
+
+            counter = RepCounter(spec, float('inf'))
+            fired = set()
+            started = time.perf_counter()
+            for start in range(0, len(sequence), args.chunk):
+                chunk = slice(start, start + args.chunk)
+                counter.update_many(angles[chunk], sequence.t[chunk], valid[chunk])
+                fired.update(counter.form_many(angles[chunk], valid[chunk]).tolist())
+            timers['update_many'].since(started)
+            warnings = sorted(spec.form_checks[index].message for index in fired if index >= 0)
+            if counter.counts != sequence.expected or warnings != sequence.warnings:
+                mismatches.append({'seed': seed, 'counts': counter.counts, 'expected': sequence.expected,
+                                   'warnings': warnings, 'expected_warnings': sequence.warnings})
+
+            if per_frame < args.per_frame:
+                one_by_one = RepCounter(spec, float('inf'))
+                started = time.perf_counter()
+                for values, t, admitted in zip(angles, sequence.t.tolist(), valid.tolist()):
+                    one_by_one.update(values if admitted else None, t)
+                timers['update'].since(started)
+                per_frame += len(sequence)
+                if one_by_one.counts != sequence.expected:
+                    mismatches.append({'seed': seed, 'frame_by_frame': True, 'counts': one_by_one.counts,
+                                       'expected': sequence.expected})
+                difference = report_difference(one_by_one.analytics.report(), counter.analytics.report())
+                if difference:
+                    mismatches.append({'seed': seed, 'analytics': difference})
+            frames += len(sequence)
+            seed += 1
+
+        result = {
+            'frames': frames,
+            'sequences': seed,
+            'mismatches': mismatches,
+            'quality': gate.stats(),
+            'generate_fps': frames / timers['generate'].total,
+            'angles_fps': frames / timers['angles'].total,
+            'update_many_fps': frames / timers['update_many'].total,
+            'update_fps': per_frame / timers['update'].total if per_frame else None,
+        }
+        report['exercises'][name] = result
+        report['correct'] &= not mismatches
+        print("%-15s %8d frames %-9s generate %6.0fk/s  angles %6.0fk/s  update_many %6.0fk/s  update %4.0fk/s" % (
+            name, frames, 'ok' if not mismatches else '%d wrong' % len(mismatches), result['generate_fps'] / 1e3,
+            result['angles_fps'] / 1e3, result['update_many_fps'] / 1e3, (result['update_fps'] or 0) / 1e3))
+    return report
+
+
+def frame_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', help="also write the results to this file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    angles = commands.add_parser('angles', help=bench_angles.__doc__)
+    angles.add_argument('--number', type=int, default=2000)
+    angles.set_defaults(run=bench_angles)
+
+    pipeline = commands.add_parser('pipeline', help=bench_pipeline.__doc__)
+    pipeline.add_argument('--video', help="recorded clip to use instead of synthetic frames")
+    pipeline.add_argument('--frames', type=int, default=120)
+    pipeline.add_argument('--size', type=frame_size, default=(640, 480), help="frame size, WIDTHxHEIGHT")
+    pipeline.add_argument('--exercise', action='append', choices=sorted(EXERCISES),
+                          help="exercise to run, may be repeated; default all")
+    pipeline.set_defaults(run=bench_pipeline)
+
+    adaptive = commands.add_parser('adaptive', help=bench_adaptive.__doc__)
+    adaptive.add_argument('--video', help="recorded clip of the exercise")
+    adaptive.add_argument('--frames', type=int, default=300)
+    adaptive.add_argument('--size', type=frame_size, default=(640, 480), help="frame size, WIDTHxHEIGHT")
+    adaptive.add_argument('--exercise', choices=sorted(EXERCISES), default='squat')
+    adaptive.add_argument('--budget', type=float, action='append', help="may be repeated; default 0.25, 0.5, 0.75")
+    adaptive.add_argument('--threshold', type=float, default=2.0)
+    adaptive.add_argument('--max-gap', type=int, default=6)
+    adaptive.set_defaults(run=bench_adaptive)
+
+    hud = commands.add_parser('hud', help=bench_hud.__doc__)
+    hud.add_argument('--frames', type=int, default=900)
+    hud.add_argument('--rep-every', type=int, default=45, help="frames between counter changes")
+    hud.add_argument('--size', type=frame_size, default=(640, 480), help="frame size, WIDTHxHEIGHT")
+    hud.set_defaults(run=bench_hud)
+
+    skeleton = commands.add_parser('skeleton', help=bench_skeleton.__doc__)
+    skeleton.add_argument('--poses', type=int, default=50)
+    skeleton.add_argument('--number', type=int, default=20)
+    skeleton.add_argument('--size', type=frame_size, default=(640, 480), help="frame size, WIDTHxHEIGHT")
+    skeleton.set_defaults(run=bench_skeleton)
+
+    people = commands.add_parser('people', help=bench_people.__doc__)
+    people.add_argument('--video', help="recorded clip of one person; default the squat figures")
+    people.add_argument('--frames', type=int, default=150)
+    people.add_argument('--size', type=frame_size, default=(320, 480), help="size of each person's part of the scene")
+    people.add_argument('--exercise', choices=sorted(EXERCISES), default='squat')
+    people.add_argument('--people', type=int, action='append', help="may be repeated; default 1 to 4")
+    people.add_argument('--detect-interval', type=int, default=15)
+    people.add_argument('--detect-width', type=int, default=1280, help="width the detector scales scenes down to")
+    people.set_defaults(run=bench_people)
+
+    roi = commands.add_parser('roi', help=bench_roi.__doc__)
+    roi.add_argument('--video', help="recorded clip of the exercise; default the squat figure in a wide frame")
+    roi.add_argument('--frames', type=int, default=300)
+    roi.add_argument('--size', type=frame_size, default=(1280, 720), help="frame size, WIDTHxHEIGHT")
+    roi.add_argument('--exercise', choices=sorted(EXERCISES), default='squat')
+    roi.set_defaults(run=bench_roi)
+
+    buffers = commands.add_parser('buffers', help=bench_buffers.__doc__)
+    buffers.add_argument('--video', help="recorded clip; default the squat figures")
+    buffers.add_argument('--frames', type=int, default=150)
+    buffers.add_argument('--warm-up', type=int, default=30, help="frames left out of the measurement")
+    buffers.add_argument('--size', type=frame_size, default=(640, 480), help="frame size of the figure clip")
+    buffers.add_argument('--exercise', choices=sorted(EXERCISES), default='squat')
+    buffers.set_defaults(run=bench_buffers)
+
+    recognize = commands.add_parser('recognize', help=bench_recognize.__doc__)
+    recognize.add_argument('--video', help="recorded clip; default the squat figures")
+    recognize.add_argument('--frames', type=int, default=300)
+    recognize.add_argument('--size', type=frame_size, default=(640, 480), help="frame size of the figure clip")
+    recognize.add_argument('--exercise', choices=sorted(EXERCISES), default='squat')
+    recognize.add_argument('--interval', type=int, default=15, help="frames between classifications")
+    recognize.add_argument('--max-per-class', type=int, default=200, help="model windows per exercise")
+    recognize.add_argument('--budget', type=float, default=0.01,
+                           help="largest share of the inference time recognition may take")
+    recognize.set_defaults(run=bench_recognize)
+
+    counting = commands.add_parser('counting', help=bench_counting.__doc__)
+    counting.add_argument('--frames', type=int, default=1000000, help="frames to count, per exercise")
+    counting.add_argument('--exercise', action='append', choices=sorted(EXERCISES),
+                          help="exercise to run, may be repeated; default all")
+    counting.add_argument('--reps', type=int, default=200, help="reps per generated sequence")
+    counting.add_argument('--fps', type=float, default=30.0)
+    counting.add_argument('--noise', type=float, default=0.002)
+    counting.add_argument('--dropout', type=float, default=0.05)
+    counting.add_argument('--partial', type=float, default=0.15)
+    counting.add_argument('--bad', type=float, default=0.15)
+    counting.add_argument('--chunk', type=int, default=4096, help="frames per update_many() call")
+    counting.add_argument('--per-frame', type=int, default=20000, help="frames also counted one at a time")
+    counting.set_defaults(run=bench_counting)
+
+    args = parser.parse_args()
+    if args.command == 'adaptive' and not args.budget:
+        args.budget = [0.25, 0.5, 0.75]
+    if args.command == 'people' and not args.people:
+        args.people = [1, 2, 3, 4]
+    report = args.run(args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({args.command: report}, f, indent=2)
+    if report.get('within_budget') is False:
+        sys.exit("%s is over budget" % args.command)
+    if report.get('correct') is False:
+        sys.exit("%s counted wrong" % args.command)
+
+
+if __name__ == '__main__':
+    main()
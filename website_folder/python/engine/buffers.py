@@ -0,0 +1,84 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """
+    Frame buffers for a capture source to read into, cap.read(buffer), so
+    steady-state capture allocates nothing. A buffer goes back with release()
+    once the pipeline is done with the frame in it, and is only handed out
+    again after that. acquire() returns None while no buffer is free, and
+    the read then allocates a frame that joins the pool when released.
+    """
+    def __init__(self, size=8):
+        self.size = size
+        self.free = []
+        self.lock = threading.Lock()
+        self.reads = 0
+        self.allocated = 0
+
+    def acquire(self):
+        with self.lock:
+            return self.free.pop() if self.free else None
+
+    def release(self, frame):
+        with self.lock:
+            if len(self.free) < self.size:
+                self.free.append(frame)
+
+    def read(self, cap):
+        """
+        cap.read() into a free buffer. Returns the frame, or None when the read failed.
+        """
+        buffer = self.acquire()
+        ret, frame = cap.read(buffer)
+        self.reads += 1
+        if frame is not buffer:
+            # First frames, or the source changed size
+            self.allocated += 1
+        if not ret:
+            if buffer is not None:
+                self.release(buffer)
+            return None
+        return frame
+
+    def stats(self):
+        with self.lock:
+            return {'reads': self.reads, 'allocated': self.allocated, 'free': len(self.free)}
+
+
+def fit(storage, shape):
+    """
+    A C-contiguous uint8 array of shape laid over storage, which is only
+    replaced, by a larger one, when it is too small. Returns (storage, array).
+    """
+    size = int(np.prod(shape))
+    if storage is None or storage.size < size:
+        storage = np.empty(size, np.uint8)
+    return storage, storage[:size].reshape(shape)
+
+
+class RgbBuffer:
+    """
+    BGR to RGB conversion for the pose graph into memory that is reused from
+    frame to frame, optionally scaling the image down first. The memory only
+    grows, so crops that change size from frame to frame, or alternate with
+    the whole frame, do not allocate. convert() returns a read-only array,
+    since the graph only reads it.
+    """
+    def __init__(self):
+        self.scaled = None
+        self.rgb = None
+
+    def convert(self, bgr, scale=1.0):
+        if scale < 1:
+            size = (max(1, int(bgr.shape[1] * scale)), max(1, int(bgr.shape[0] * scale)))
+            self.scaled, scaled = fit(self.scaled, (size[1], size[0], 3))
+            cv2.resize(bgr, size, dst=scaled, interpolation=cv2.INTER_AREA)
+            bgr = scaled
+        self.rgb, rgb = fit(self.rgb, bgr.shape)
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        rgb.flags.writeable = False
+        return rgb
@@ -0,0 +1,144 @@
+import collections
+
+from website_folder.python.engine.adaptive import KeyframeScheduler
+from website_folder.python.engine.analyzer import FrameAnalyzer
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.hud import HudCompositor
+from website_folder.python.engine.overlay import CONNECTION_SPEC, LANDMARK_SPEC, draw_overlay
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.runner import run_session
+from website_folder.python.engine.skeleton import SkeletonRenderer
+from website_folder.python.engine.specs import EXERCISES
+
+CIRCUIT = 'circuit'
+# Seconds a finished exercise stays on screen before the next one starts counting
+PAUSE = 3.0
+
+
+def parse_circuit(steps):
+    """
+    Ordered (exercise, target) pairs from pairs or {'exercise', 'target'}
+    dicts. The target is reps, or seconds for holds. Raises KeyError for an
+    unknown exercise and ValueError for a bad target or an empty circuit.
+    """
+    circuit = []
+    for step in steps:
+        exercise, target = (step['exercise'], step['target']) if isinstance(step, dict) else step
+        if exercise not in EXERCISES:
+            raise KeyError(exercise)
+        target = int(target)
+        if target <= 0:
+            raise ValueError("Invalid target %r for %s." % (target, exercise))
+        circuit.append((exercise, target))
+    if not circuit:
+        raise ValueError("A circuit needs at least one exercise.")
+    return circuit
+
+
+class CircuitStep:
+    """
+    Counter and timings of one exercise of a circuit. started and finished
+    are frame times; finished is set by the frame that completed it.
+    """
+    def __init__(self, exercise, target):
+        self.spec = EXERCISES[exercise]
+        self.target = target
+        self.counter = RepCounter(self.spec, target)
+        self.started = None
+        self.finished = None
+        self.last_t = None
+        self.frames = 0
+        self.warnings = collections.Counter()
+
+    def report(self):
+        state = self.counter.state()
+        end = self.finished if self.finished is not None else self.last_t
+        return {
+            'exercise': self.spec.name,
+            'target': self.target,
+            'counts': state['counts'],
+            'complete': state['complete'],
+            'elapsed': end - self.started if self.started is not None else 0.0,
+            'frames': self.frames,
+            'form_warnings': dict(self.warnings),
+            'analytics': self.counter.analytics.report(),
+        }
+
+
+class CircuitAnalyzer:
+    """
+    Rep counting for an ordered list of exercises over one stream of frames.
+    One FrameAnalyzer, and so one pose graph and landmark tracker, serves the
+    whole circuit: once an exercise has been complete for pause seconds, the
+    next exercise's counter is swapped in. The state of each FrameResult
+    has the index of the step it was counted for under 'step' and its
+    exercise under 'exercise'.
+    """
+    def __init__(self, pose, circuit, scheduler=None, pause=PAUSE):
+        self.steps = [CircuitStep(exercise, target) for exercise, target in circuit]
+        self.index = 0
+        self.pause = pause
+        self.analyzer = FrameAnalyzer(pose, self.steps[0].counter, scheduler)
+
+    def analyze(self, frame, t):
+        step = self.steps[self.index]
+        if step.finished is not None and t - step.finished >= self.pause and self.index + 1 < len(self.steps):
+            self.index += 1
+            step = self.steps[self.index]
+            self.analyzer.counter = step.counter
+        if step.started is None:
+            step.started = t
+
+        previous = step.counter.form_message
+        result = self.analyzer.analyze(frame, t)
+        state = result.state
+        step.frames += 1
+        step.last_t = t
+        # Count each time a warning comes up, not every frame it stays up
+        if state['form_message'] and state['form_message'] != previous:
+            step.warnings[state['form_message']] += 1
+        if state['complete'] and step.finished is None:
+            step.finished = t
+        state['step'] = self.index
+        state['exercise'] = step.spec.name
+        return result
+
+    def report(self):
+        steps = [step.report() for step in self.steps]
+        return {
+            'steps': steps,
+            'step': self.index,
+            'complete': all(step['complete'] for step in steps),
+        }
+
+
+def run_circuit(circuit, budget=None, on_frame=None, pause=PAUSE, watchdog=None):
+    """
+    Run a circuit of exercises on the local webcam until the user presses
+    'x', keeping the camera, window and pose graph open throughout. Returns
+    the per-exercise breakdown under 'steps', with 'pipeline', 'capture',
+    'quality', 'inference', 'watchdog' and 'video' as in run_exercise().
+    on_frame(state) gets the counter state of the current exercise, with its
+    position in the circuit under 'step' and its name under 'exercise'.
+    """
+    circuit = parse_circuit(circuit)
+    scheduler = KeyframeScheduler(budget) if budget else None
+    huds = {exercise: HudCompositor(EXERCISES[exercise]) for exercise, _ in circuit}
+    skeleton = SkeletonRenderer(LANDMARK_SPEC, CONNECTION_SPEC)
+
+    def draw(result):
+        spec = EXERCISES[result.state['exercise']]
+        draw_overlay(result.frame, spec, result.state, result.points, result.visible, result.angles,
+                     huds[spec.name], skeleton)
+        return result.points is not None, result.state
+
+    with pose_pool.checkout() as pose:
+        analyzer = CircuitAnalyzer(pose, circuit, scheduler, pause)
+        session = run_session(CIRCUIT, analyzer.analyze, draw, on_frame, watchdog)
+
+    state = analyzer.report()
+    state['quality'] = analyzer.analyzer.gate.stats()
+    if scheduler:
+        state['inference'] = scheduler.stats()
+    state.update(session)
+    return state
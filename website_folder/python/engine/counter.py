@@ -0,0 +1,190 @@
+import numpy as np
+
+from website_folder.python.engine.analytics import RepAnalytics, last_index
+
+
+def holds(clauses, angles):
+    for index, low, high in clauses:
+        if not low < angles[index] < high:
+            return False
+    return True
+
+
+def holds_many(clauses, angles):
+    """
+    holds() for every row of an (N, angles) array at once.
+    """
+    mask = np.ones(len(angles), bool)
+    for index, low, high in clauses:
+        column = angles[:, index]
+        mask &= (low < column) & (column < high)
+    return mask
+
+
+class RepCounter:
+    """
+    Shared rep-counting state machine, driven by an ExerciseSpec.
+    update() takes the spec's joint angles for one frame (None when nobody
+    was detected) and the frame time in seconds. Tempo and range of motion
+    are kept by the counter's RepAnalytics as it goes.
+    """
+    def __init__(self, spec, target):
+        self.spec = spec
+        self.target = target
+        self.counts = {track.name: 0 for track in spec.tracks}
+        self.stages = {track.name: None for track in spec.tracks}
+        self.held = 0.0
+        self.last_t = None
+        self.form_message = None
+        self.complete = False
+        # How many frames of the last update_many() batch had their form
+        # checked: those up to the one that completed the exercise
+        self.form_frames = 0
+        self.analytics = RepAnalytics(spec)
+
+    def update(self, angles, t):
+        self.form_message = None
+        if angles is not None:
+            if self.spec.counting == 'hold':
+                self.update_hold(angles, t)
+            else:
+                for track in self.spec.tracks:
+                    entered = holds(track.enter, angles)
+                    in_count = holds(track.count, angles)
+                    if entered:
+                        self.stages[track.name] = track.stages[0]
+                    counted = self.stages[track.name] == track.stages[0] and in_count
+                    if counted:
+                        self.stages[track.name] = track.stages[1]
+                        self.counts[track.name] += 1
+                    self.analytics.rep(track, angles, t, entered, in_count, counted)
+
+            if not self.complete:
+                for check in self.spec.form_checks:
+                    if all(any(holds((clause,), angles) for clause in group) for group in check.groups):
+                        self.form_message = check.message
+                        break
+        else:
+            self.last_t = None
+            if self.spec.counting == 'hold':
+                self.analytics.hold(None, t, False)
+
+        if not self.complete and all(count >= self.target for count in self.counts.values()):
+            self.complete = True
+        return self.state()
+
+    def update_many(self, angles, t, valid=None):
+        """
+        Same as calling update() for every row of an (N, angles) array, with
+        times t and a mask of the frames where somebody was detected, in a
+        handful of array operations. Returns, per track, the indices of the
+        frames that counted a rep (a whole second, for holds), so a long
+        recording can be fed in chunks.
+        """
+        angles = np.asarray(angles)
+        t = np.asarray(t, np.float64)
+        n = len(angles)
+        if valid is None:
+            valid = np.ones(n, bool)
+        if n == 0:
+            return {name: np.empty(0, np.intp) for name in self.counts}
+
+        if self.spec.counting == 'hold':
+            counted, totals = self.update_hold_many(angles, t, valid)
+        else:
+            counted, totals = {}, []
+            for track in self.spec.tracks:
+                enter = valid & holds_many(track.enter, angles)
+                count = valid & holds_many(track.count, angles)
+                # A frame counts when it satisfies 'count' and no earlier
+                # 'count' frame came after the latest 'enter'. Being in
+                # stages[0] before the chunk acts as an 'enter' just before it.
+                start = -1 if self.stages[track.name] == track.stages[0] else -2
+                last_enter = last_index(enter, start)
+                last_count = np.concatenate([[-2], last_index(count, -2)[:-1]])
+                reps = count & (last_enter > last_count)
+                counted[track.name] = np.flatnonzero(reps)
+                self.analytics.rep_many(track, angles, t, valid, enter, count, reps)
+                totals.append(self.counts[track.name] + np.cumsum(reps))
+
+                if counted[track.name].size and counted[track.name][-1] >= last_enter[-1]:
+                    self.stages[track.name] = track.stages[1]
+                elif last_enter[-1] > -2:
+                    self.stages[track.name] = track.stages[0]
+                self.counts[track.name] = int(totals[-1][-1])
+
+        # Counts only grow, so the frame that completes the exercise is the
+        # last of the frames where each track first reaches the target
+        was_complete = self.complete
+        finished = max(int(np.searchsorted(total, self.target)) for total in totals)
+        self.complete = was_complete or finished < n
+        self.form_frames = 0 if was_complete else min(finished + 1, n)
+
+        # Form checks stop once the exercise is complete, so only the last
+        # frame's message survives, as with update()
+        self.form_message = None
+        if valid[-1] and not (was_complete or finished < n - 1):
+            last = angles[-1]
+            for check in self.spec.form_checks:
+                if all(any(holds((clause,), last) for clause in group) for group in check.groups):
+                    self.form_message = check.message
+                    break
+        return counted
+
+    def form_many(self, angles, valid):
+        """
+        Index into spec.form_checks of the check that update() would report
+        for each row of an (N, angles) array, or -1 where none fires.
+        """
+        fired = np.full(len(angles), -1)
+        # The first matching check wins, so apply them last to first
+        for index in reversed(range(len(self.spec.form_checks))):
+            mask = np.array(valid, bool)
+            for group in self.spec.form_checks[index].groups:
+                mask &= np.any([holds_many((clause,), angles) for clause in group], axis=0)
+            fired[mask] = index
+        return fired
+
+    def update_hold_many(self, angles, t, valid):
+        in_position = valid & holds_many(self.spec.hold, angles)
+        self.analytics.hold_many(angles, t, in_position)
+        # Time accrues between consecutive in-position frames, starting from
+        # the last in-position frame of the previous chunk
+        previous_t = np.concatenate([[np.nan if self.last_t is None else self.last_t], t[:-1]])
+        previous_in = np.concatenate([[self.last_t is not None], in_position[:-1]])
+        gained = np.where(in_position & previous_in, t - previous_t, 0.0)
+        held = np.cumsum(np.concatenate([[self.held], gained]))
+        seconds = held.astype(np.int64)
+
+        self.held = float(held[-1])
+        self.last_t = float(t[-1]) if in_position[-1] else None
+        # Frames without a person leave the stage alone
+        detected = np.flatnonzero(valid)
+        if detected.size:
+            self.stages['total'] = 'hold' if in_position[detected[-1]] else None
+        self.counts['total'] = int(seconds[-1])
+        return {'total': np.flatnonzero(np.diff(seconds))}, [seconds[1:]]
+
+    def update_hold(self, angles, t):
+        in_position = holds(self.spec.hold, angles)
+        self.analytics.hold(angles, t, in_position)
+        if in_position and self.last_t is not None:
+            self.held += t - self.last_t
+        self.last_t = t if in_position else None
+        self.stages['total'] = 'hold' if in_position else None
+        self.counts['total'] = int(self.held)
+
+    def remaining(self):
+        return max(self.target - self.counts['total'], 0)
+
+    def state(self):
+        state = {
+            'counts': dict(self.counts),
+            'stages': dict(self.stages),
+            'form_message': self.form_message,
+            'complete': self.complete,
+        }
+        if self.spec.counting == 'hold':
+            # None until the position is reached for the first time
+            state['remaining'] = self.remaining() if self.held or self.last_t is not None else None
+        return state
@@ -0,0 +1,123 @@
+import collections
+import json
+import threading
+import time
+
+# At most this many flushes per second per subscriber; events in between are merged
+MIN_INTERVAL = 0.1
+KEEPALIVE = 15
+
+
+def state_events(previous, state):
+    """
+    What changed between two counter states, as (kind, data) pairs.
+    """
+    events = []
+    # A circuit moving on to its next exercise starts the counters afresh
+    if previous is not None and previous.get('step') != state.get('step'):
+        events.append(('step', {'step': state['step'], 'exercise': state['exercise']}))
+        previous = None
+    # So does a session switching to the exercise it recognised
+    elif previous is not None and previous.get('exercise') != state.get('exercise'):
+        events.append(('exercise', {'exercise': state['exercise']}))
+        previous = None
+    # A class gains tracks as people walk into view
+    for track, count in state['counts'].items():
+        if previous is None or count > previous['counts'].get(track, 0):
+            if previous is not None or count:
+                events.append(('rep', {'track': track, 'count': count}))
+    for track, stage in state['stages'].items():
+        if (previous['stages'].get(track) if previous else None) != stage:
+            events.append(('stage', {'track': track, 'stage': stage}))
+    if (previous['form_message'] if previous else None) != state['form_message']:
+        events.append(('form', {'message': state['form_message']}))
+    if state['complete'] and not (previous and previous['complete']):
+        events.append(('complete', {'counts': state['counts']}))
+    return events
+
+
+def coalesce(events):
+    """
+    Keep only the latest rep count and stage per track and the latest form
+    message, in the order they last changed.
+    """
+    latest = {}
+    for seq, kind, data in events:
+        key = (kind, data.get('track'))
+        latest.pop(key, None)
+        latest[key] = (seq, kind, data)
+    return list(latest.values())
+
+
+def sse(kind, data, seq=None):
+    message = 'event: %s\ndata: %s\n\n' % (kind, json.dumps(data, separators=(',', ':')))
+    return message if seq is None else 'id: %d\n' % seq + message
+
+
+class EventChannel:
+    """
+    Counter changes of one exercise session, fanned out to any number of
+    Server-Sent Events subscribers. Publishers hand over whole states; the
+    channel turns them into events and keeps the most recent ones so a slow
+    or reconnecting subscriber can catch up.
+    """
+    def __init__(self, backlog=256):
+        self.log = collections.deque(maxlen=backlog)
+        self.seq = 0
+        self.state = None
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def publish(self, state):
+        with self.cond:
+            events = state_events(self.state, state)
+            self.state = state
+            for kind, data in events:
+                self.seq += 1
+                self.log.append((self.seq, kind, data))
+            if events:
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def snapshot(self):
+        return sse('state', self.state or {}, self.seq)
+
+    def stream(self, last_id=None, min_interval=MIN_INTERVAL, keepalive=KEEPALIVE):
+        """
+        Generator of SSE messages, starting with the full state unless the
+        client is resuming from last_id. Ends when the channel is closed.
+        """
+        with self.cond:
+            seq = self.seq
+            resume = last_id is not None and self.log and self.log[0][0] <= last_id + 1 and last_id <= self.seq
+            if resume:
+                seq = last_id
+            else:
+                first = self.snapshot()
+        if not resume:
+            yield first
+
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.seq > seq or self.closed, timeout=keepalive)
+                lost = bool(self.log) and self.log[0][0] > seq + 1
+                events = [event for event in self.log if event[0] > seq]
+                seq = self.seq
+                closed = self.closed
+                snapshot = self.snapshot() if lost else None
+
+            if snapshot:
+                yield snapshot
+            else:
+                for event_seq, kind, data in coalesce(events):
+                    yield sse(kind, data, event_seq)
+            if closed:
+                yield sse('end', {})
+                return
+            if not events:
+                yield ': keepalive\n\n'
+            time.sleep(min_interval)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from website_folder.python.engine.landmarks import VISIBILITY
+
+# Joints hidden behind the body in a side-on view still score 0.15-0.45 and
+# their estimated positions count fine; joints out of the frame score near 0
+MIN_VISIBILITY = 0.1
+
+
+class QualityGate:
+    """
+    Decides once per frame whether its landmarks are worth counting on:
+    somebody was found (else the frame is dropped) and every joint the
+    exercise measures is in view (else it is skipped). Frames that do not
+    pass never reach the angle and counter work, which sees them as frames
+    without a person. Counting that raises is recorded as an error rather
+    than ending the session (such frames still count as passed), with the
+    last error kept for the report.
+    """
+    def __init__(self, min_visibility=MIN_VISIBILITY):
+        self.min_visibility = min_visibility
+        self.passed = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+
+    def admit(self, spec, points):
+        if points is None:
+            self.dropped += 1
+            return False
+        if (points[spec.joints, VISIBILITY] < self.min_visibility).any():
+            self.skipped += 1
+            return False
+        self.passed += 1
+        return True
+
+    def admit_many(self, spec, points, present=None):
+        """
+        admit() for every frame of an (N, 33, 4) landmark array at once, with
+        frames marked absent in present (or holding NaN) dropped. Returns the
+        mask of frames that passed.
+        """
+        if present is None:
+            present = ~np.isnan(points).any(axis=(1, 2))
+        passed = present & (points[:, spec.joints, VISIBILITY] >= self.min_visibility).all(axis=1)
+        self.passed += int(passed.sum())
+        self.dropped += int((~present).sum())
+        self.skipped += int((present & ~passed).sum())
+        return passed
+
+    def failed(self, error):
+        self.errors += 1
+        self.last_error = '%s: %s' % (type(error).__name__, error)
+
+    def stats(self):
+        return {
+            'passed': self.passed,
+            'dropped': self.dropped,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+from website_folder.python.engine.overlay import draw_banner, draw_status
+
+
+class HudLayer:
+    """
+    One pre-rendered HUD element: the smallest patch of the frame it covers,
+    and a mask of the pixels it paints over completely.
+    """
+    def __init__(self, shape, draw):
+        # Draw onto a black and a white canvas: pixels that come out the same
+        # on both are the ones the element covers, everything else is the frame
+        black = np.zeros(shape, np.uint8)
+        white = np.full(shape, 255, np.uint8)
+        draw(black)
+        draw(white)
+        covered = (black == white).all(axis=2)
+        rows = np.flatnonzero(covered.any(axis=1))
+        cols = np.flatnonzero(covered.any(axis=0))
+        if not rows.size:
+            self.box = None
+            return
+        top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        self.box = (slice(top, bottom), slice(left, right))
+        self.patch = black[self.box].copy()
+        self.mask = covered[self.box].astype(np.uint8)
+
+    def blit(self, frame):
+        if self.box is not None:
+            cv2.copyTo(self.patch, self.mask, frame[self.box])
+
+
+class HudCompositor:
+    """
+    Status boxes and banners only change when the counter does, so each one is
+    rendered once per distinct value and then copied onto every frame instead
+    of being laid out again with getTextSize, rectangle and putText.
+    """
+    def __init__(self, spec, max_layers=32):
+        self.spec = spec
+        self.max_layers = max_layers
+        self.layers = {}
+        self.renders = 0
+
+    def layer(self, key, shape, draw):
+        key = key + (shape,)
+        layer = self.layers.get(key)
+        if layer is None:
+            if len(self.layers) >= self.max_layers:
+                self.layers.clear()
+            layer = self.layers[key] = HudLayer(shape, draw)
+            self.renders += 1
+        return layer
+
+    def draw_status(self, frame, state):
+        values = (state['remaining'],) if self.spec.counting == 'hold' else tuple(state['counts'].values())
+        self.layer(('status', values), frame.shape,
+                   lambda canvas: draw_status(canvas, self.spec, state)).blit(frame)
+
+    def draw_banner(self, frame, message, font, color):
+        self.layer(('banner', message, font, color), frame.shape,
+                   lambda canvas: draw_banner(canvas, message, font, color)).blit(frame)
+
+    def stats(self):
+        return {'layers': len(self.layers), 'renders': self.renders}
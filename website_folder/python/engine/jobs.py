@@ -0,0 +1,194 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from website_folder.python.engine.circuit import CIRCUIT, parse_circuit, run_circuit
+from website_folder.python.engine.events import EventChannel
+from website_folder.python.engine.multiperson import run_class
+from website_folder.python.engine.runner import run_exercise
+from website_folder.python.engine.specs import EXERCISES
+from website_folder.python.engine.watchdog import supervisor
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobRejected(RuntimeError):
+    pass
+
+
+class ExerciseJob:
+    """
+    One webcam exercise, a circuit of them or a class doing one, run in the
+    background. The counter state of the last displayed frame is kept as
+    progress until the run ends with its result, and every change is
+    published on events.
+    """
+    def __init__(self, exercise, target, owner=None):
+        self.id = uuid.uuid4().hex
+        self.exercise = exercise
+        self.target = target
+        self.owner = owner
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.future = None
+        self.events = EventChannel()
+
+    def run(self, runner, *args):
+        if self.cancelled.is_set():
+            self.status = CANCELLED
+            self.finished = time.time()
+            self.events.close()
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        try:
+            self.result = runner(*args, on_frame=self.on_frame)
+            self.status = CANCELLED if self.cancelled.is_set() else DONE
+        except Exception as e:
+            self.error = '%s: %s' % (type(e).__name__, e)
+            self.status = FAILED
+        finally:
+            self.finished = time.time()
+            self.events.close()
+
+    def on_frame(self, state):
+        self.progress = state
+        self.events.publish(state)
+        return not self.cancelled.is_set()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+            self.finished = time.time()
+            self.events.close()
+
+    def summary(self):
+        state = self.result or self.progress
+        if self.started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished or time.time()) - self.started
+        summary = {
+            'job_id': self.id,
+            'exercise': self.exercise,
+            'target': self.target,
+            'status': self.status,
+            'elapsed': elapsed,
+            # A circuit's result has its counts per exercise under 'steps',
+            # and a class's per person under 'people'
+            'counts': state.get('counts') if state else None,
+            'complete': state['complete'] if state else False,
+            'form_message': state.get('form_message') if state else None,
+        }
+        if self.result is not None:
+            summary['result'] = self.result
+        if self.error is not None:
+            summary['error'] = self.error
+        return summary
+
+
+class JobManager:
+    """
+    Runs exercise jobs one at a time on a single display thread of its own.
+    Every job opens an OpenCV HighGUI window, and HighGUI is not safe to use
+    from several threads at once (on macOS not even from any thread but the
+    main one, so jobs cannot run there at all). Submitting returns at once;
+    a job is refused when one is running and max_queued more are already
+    waiting, rather than queueing without bound. Finished jobs are kept for
+    retention seconds so their result can still be fetched.
+    """
+    def __init__(self, max_queued=2, retention=3600, runner=run_exercise, circuit_runner=run_circuit,
+                 class_runner=run_class):
+        self.max_queued = max_queued
+        self.retention = retention
+        self.runner = runner
+        self.circuit_runner = circuit_runner
+        self.class_runner = class_runner
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def init_app(self, app):
+        self.max_queued = app.config.get('EXERCISE_JOB_QUEUE', self.max_queued)
+
+    def submit(self, exercise, target, owner=None):
+        if exercise not in EXERCISES:
+            raise KeyError(exercise)
+        job = ExerciseJob(exercise, target, owner)
+        return self.enqueue(job, self.runner, exercise, target)
+
+    def submit_circuit(self, circuit, owner=None):
+        """
+        Queue a circuit of (exercise, target) steps as one job, so the camera
+        and pose graph stay open from one exercise to the next.
+        """
+        circuit = parse_circuit(circuit)
+        job = ExerciseJob(CIRCUIT, circuit, owner)
+        return self.enqueue(job, self.circuit_runner, circuit)
+
+    def submit_class(self, exercise, target, owner=None):
+        """
+        Queue one exercise for everyone in front of the camera, each person
+        counted on their own (see run_class).
+        """
+        if exercise not in EXERCISES:
+            raise KeyError(exercise)
+        job = ExerciseJob('class-' + exercise, target, owner)
+        return self.enqueue(job, self.class_runner, exercise, target)
+
+    def enqueue(self, job, runner, *args):
+        with self.lock:
+            self.prune()
+            pending = sum(1 for j in self.jobs.values() if j.status in (QUEUED, RUNNING))
+            if pending >= 1 + self.max_queued:
+                raise JobRejected("%d exercise sessions are already running or waiting." % pending)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(1, thread_name_prefix='exercise-display')
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(job.run, runner, *args)
+        return job
+
+    def get(self, job_id, owner=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or owner is not None and job.owner != owner:
+            return None
+        return job
+
+    def list(self, owner=None):
+        with self.lock:
+            return [job for job in self.jobs.values() if owner is None or job.owner == owner]
+
+    def cancel(self, job_id, owner=None):
+        job = self.get(job_id, owner)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def prune(self):
+        # Called with the lock held
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self.jobs[job_id]
+
+    def stats(self):
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            'max_queued': self.max_queued,
+            'running': statuses.count(RUNNING),
+            'queued': statuses.count(QUEUED),
+            'watchdog': supervisor.stats(),
+        }
+
+
+jobs = JobManager()
@@ -0,0 +1,97 @@
+import numpy as np
+
+# MediaPipe Pose landmark names in index order (mp.solutions.pose.PoseLandmark)
+LANDMARK_NAMES = (
+    'NOSE', 'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER', 'RIGHT_EYE_INNER', 'RIGHT_EYE',
+    'RIGHT_EYE_OUTER', 'LEFT_EAR', 'RIGHT_EAR', 'MOUTH_LEFT', 'MOUTH_RIGHT', 'LEFT_SHOULDER',
+    'RIGHT_SHOULDER', 'LEFT_ELBOW', 'RIGHT_ELBOW', 'LEFT_WRIST', 'RIGHT_WRIST', 'LEFT_PINKY',
+    'RIGHT_PINKY', 'LEFT_INDEX', 'RIGHT_INDEX', 'LEFT_THUMB', 'RIGHT_THUMB', 'LEFT_HIP',
+    'RIGHT_HIP', 'LEFT_KNEE', 'RIGHT_KNEE', 'LEFT_ANKLE', 'RIGHT_ANKLE', 'LEFT_HEEL',
+    'RIGHT_HEEL', 'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX',
+)
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+# Columns of a landmark array
+X, Y, Z, VISIBILITY = range(4)
+
+# mp_drawing leaves out landmarks below either threshold
+VISIBILITY_THRESHOLD = 0.5
+PRESENCE_THRESHOLD = 0.5
+
+# A serialized NormalizedLandmarkList whose landmarks all carry x, y, z,
+# visibility and presence is 33 fixed-size 27 byte records of tagged
+# little-endian floats, so the array can be gathered straight out of the bytes
+# instead of reading 132 message attributes.
+WIRE_RECORD_SIZE = 27
+WIRE_TAGS = np.tile(np.array([0x0a, 25, 0x0d, 0x15, 0x1d, 0x25, 0x2d], np.uint8), NUM_LANDMARKS)
+WIRE_TAG_INDEX = (np.arange(NUM_LANDMARKS)[:, None] * WIRE_RECORD_SIZE + [0, 1, 2, 7, 12, 17, 22]).ravel()
+WIRE_FLOAT_INDEX = (np.arange(NUM_LANDMARKS)[:, None, None] * WIRE_RECORD_SIZE
+                    + np.array([3, 8, 13, 18])[:, None] + np.arange(4)).ravel()
+WIRE_PRESENCE_INDEX = (np.arange(NUM_LANDMARKS)[:, None] * WIRE_RECORD_SIZE + 23 + np.arange(4)).ravel()
+
+
+def calculate_angle(a, b, c):
+    a = np.array(a)
+    b = np.array(b)
+    c = np.array(c)
+
+    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
+    angle = np.abs(radians * 180.0 / np.pi)
+
+    if angle > 180.0:
+        angle = 360 - angle
+
+    return angle
+
+
+class LandmarkBuffer:
+    """
+    Preallocated (33, 4) float32 array of x, y, z, visibility that is refilled
+    from results.pose_landmarks on every frame, with each landmark's presence
+    kept alongside for drawing.
+    """
+    def __init__(self):
+        self.points = np.zeros((NUM_LANDMARKS, 4), np.float32)
+        self.bytes = self.points.view(np.uint8).reshape(-1)
+        self.presence = np.zeros(NUM_LANDMARKS, np.float32)
+        self.presence_bytes = self.presence.view(np.uint8)
+
+    def fill(self, pose_landmarks):
+        raw = np.frombuffer(pose_landmarks.SerializeToString(), np.uint8)
+        if raw.size == NUM_LANDMARKS * WIRE_RECORD_SIZE and np.array_equal(raw[WIRE_TAG_INDEX], WIRE_TAGS):
+            np.take(raw, WIRE_FLOAT_INDEX, out=self.bytes)
+            np.take(raw, WIRE_PRESENCE_INDEX, out=self.presence_bytes)
+            return self.points
+
+        # Some field was missing, fall back to reading the message
+        self.points[:] = [(l.x, l.y, l.z, l.visibility) for l in pose_landmarks.landmark]
+        self.presence[:] = [l.presence if l.HasField('presence') else 1.0 for l in pose_landmarks.landmark]
+        return self.points
+
+    def visible(self):
+        """
+        Mask of the landmarks mp_drawing would draw.
+        """
+        return (self.points[:, VISIBILITY] >= VISIBILITY_THRESHOLD) & (self.presence >= PRESENCE_THRESHOLD)
+
+
+class AngleKernel:
+    """
+    Computes a table of joint angles (a, b, c landmark index triplets, angle
+    at b in degrees) with one batch of NumPy calls. Works on a single (33, 4)
+    frame or a stack of frames shaped (..., 33, 4).
+    """
+    def __init__(self, triplets):
+        triplets = np.asarray(triplets, np.intp).reshape(-1, 3)
+        self.size = len(triplets)
+        # Rays b->a and b->c for every triplet come out of a single gather
+        self.index = np.concatenate([triplets[:, 0], triplets[:, 2], triplets[:, 1], triplets[:, 1]])
+
+    def __call__(self, points):
+        joints = points[..., self.index, :2]
+        rays = joints[..., :2 * self.size, :] - joints[..., 2 * self.size:, :]
+        theta = np.arctan2(rays[..., 1], rays[..., 0])
+        angle = np.abs(theta[..., self.size:] - theta[..., :self.size])
+        angle *= 180.0 / np.pi
+        return np.minimum(angle, 360.0 - angle)
@@ -0,0 +1,295 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from website_folder.python.engine.buffers import RgbBuffer
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.gate import QualityGate
+from website_folder.python.engine.landmarks import X, Y, LandmarkBuffer
+from website_folder.python.engine.overlay import CONNECTION_SPEC, LANDMARK_SPEC, draw_people
+from website_folder.python.engine.pool import PoolExhausted, pose_pool
+from website_folder.python.engine.runner import run_session
+from website_folder.python.engine.skeleton import SkeletonRenderer
+from website_folder.python.engine.specs import EXERCISES
+
+MAX_PEOPLE = 4
+# Frames between person detections; in between, boxes follow the landmarks
+DETECT_INTERVAL = 15
+# Pose runs on the person's box grown on every side by this fraction of its longer side
+CROP_MARGIN = 0.25
+
+
+class HogDetector:
+    """
+    OpenCV's HOG people detector on a copy of the frame scaled down to width.
+    Returns (N, 4) x, y, width, height boxes in frame pixels.
+    """
+    def __init__(self, width=640, min_score=0.5):
+        self.width = width
+        self.min_score = min_score
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def __call__(self, frame):
+        scale = min(1.0, self.width / frame.shape[1])
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        boxes, scores = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        return boxes[np.ravel(scores) >= self.min_score] / scale
+
+
+def box_overlap(a, b):
+    """
+    Intersection of every (x, y, w, h) box of a with every box of b, as a
+    fraction of the smaller of the two. Landmark boxes hug the joints while
+    detector boxes have a margin, so plain IoU would undersell a match.
+    """
+    a = np.asarray(a, np.float64).reshape(-1, 1, 4)
+    b = np.asarray(b, np.float64).reshape(1, -1, 4)
+    w = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    h = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    smaller = np.minimum(a[..., 2] * a[..., 3], b[..., 2] * b[..., 3])
+    return np.where(smaller > 0, inter / np.where(smaller > 0, smaller, 1), 0.0)
+
+
+def crop_box(box, shape, margin=CROP_MARGIN):
+    """
+    Integer x0, y0, x1, y1 of the box grown by margin and clipped to the frame.
+    """
+    height, width = shape[:2]
+    x, y, w, h = box
+    grow = max(w, h) * margin
+    x0 = int(max(0, x - grow))
+    y0 = int(max(0, y - grow))
+    x1 = int(min(width, x + w + grow))
+    y1 = int(min(height, y + h + grow))
+    return x0, y0, x1, y1
+
+
+class PersonResult:
+    """
+    What one frame produced for one tracked person, in frame coordinates.
+    """
+    def __init__(self, person_id, box, points, visible, angles, state):
+        self.id = person_id
+        self.box = box
+        self.points = points
+        self.visible = visible
+        self.angles = angles
+        self.state = state
+
+
+class PersonTrack:
+    """
+    One person in view: where they are, the pose graph that follows them and
+    their own rep counter. Pose runs on a crop around the box, and the box
+    is then moved to wherever the landmarks went. While the landmarks are
+    lost the crop widens every frame, in case the box only caught part of
+    the person.
+    """
+    def __init__(self, person_id, box, pose, spec, target):
+        self.id = person_id
+        self.box = np.asarray(box, np.float64)
+        self.pose = pose
+        self.counter = RepCounter(spec, target)
+        self.buffer = LandmarkBuffer()
+        self.rgb = RgbBuffer()
+        self.gate = QualityGate()
+        self.missed = 0
+
+    def process(self, frame, t):
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = crop_box(self.box, frame.shape, min(CROP_MARGIN * (1 + self.missed), 1.0))
+        points = visible = angles = None
+        if x1 > x0 and y1 > y0:
+            pose_landmarks = self.pose.process(self.rgb.convert(frame[y0:y1, x0:x1])).pose_landmarks
+            if pose_landmarks:
+                points = self.buffer.fill(pose_landmarks).copy()
+                points[:, X] = (points[:, X] * (x1 - x0) + x0) / width
+                points[:, Y] = (points[:, Y] * (y1 - y0) + y0) / height
+                visible = self.buffer.visible()
+        if self.gate.admit(self.counter.spec, points):
+            try:
+                angles = self.counter.spec.kernel(points).tolist()
+            except Exception as e:
+                self.gate.failed(e)
+
+        if points is not None and visible.sum() >= 2:
+            self.missed = 0
+            xy = points[visible][:, [X, Y]] * [width, height]
+            low, high = xy.min(axis=0), xy.max(axis=0)
+            self.box = np.concatenate([low, high - low])
+        else:
+            self.missed += 1
+        state = self.counter.update(angles, t)
+        return PersonResult(self.id, self.box.copy(), points, visible, angles, state)
+
+    def report(self):
+        state = self.counter.state()
+        state['analytics'] = self.counter.analytics.report()
+        return state
+
+
+class MultiPersonResult:
+    def __init__(self, frame, t, people):
+        self.frame = frame
+        self.t = t
+        self.people = people
+
+
+class MultiPersonAnalyzer:
+    """
+    Rep counting for everyone in view of one camera. People are found by the
+    detector every detect_interval frames (and on every frame while nobody is
+    tracked), matched to the people already tracked by box overlap, and each
+    tracked person gets a pose graph of their own from the pool. MediaPipe
+    Pose takes one image per call, so the crops of a frame are processed
+    concurrently on worker threads (one per person by default) rather than
+    as a batch. A person missed for max_missed frames in a row is dropped
+    and their graph given back.
+    """
+    def __init__(self, spec, target, pool=pose_pool, detector=None, max_people=MAX_PEOPLE,
+                 detect_interval=DETECT_INTERVAL, max_missed=2 * DETECT_INTERVAL, min_overlap=0.5, workers=None):
+        self.spec = spec
+        self.target = target
+        self.pool = pool
+        self.detector = detector or HogDetector()
+        self.max_people = max_people
+        self.detect_interval = detect_interval
+        self.max_missed = max_missed
+        self.min_overlap = min_overlap
+        self.tracks = []
+        self.next_id = 1
+        self.frames = 0
+        self.detections = 0
+        self.executor = ThreadPoolExecutor(workers or max_people, thread_name_prefix='person')
+        self.finished = {}
+        self.gates = {}
+
+    def detect(self, frame):
+        boxes = self.detector(frame)
+        self.detections += 1
+        unmatched = list(range(len(boxes)))
+        if self.tracks and len(boxes):
+            overlap = box_overlap([track.box for track in self.tracks], boxes)
+            # Greedy matching, best overlap first. A detection keeps its track
+            # alive, and replaces the box of one that lost its landmarks.
+            matched = set()
+            for i, j in zip(*np.unravel_index(np.argsort(-overlap, axis=None), overlap.shape)):
+                if overlap[i, j] < self.min_overlap:
+                    break
+                if i not in matched and j in unmatched:
+                    matched.add(i)
+                    unmatched.remove(j)
+                    if self.tracks[i].missed:
+                        self.tracks[i].box = boxes[j]
+                    self.tracks[i].missed = 0
+        for j in unmatched:
+            if len(self.tracks) >= self.max_people:
+                break
+            try:
+                pose = self.pool.acquire(timeout=0)
+            except PoolExhausted:
+                break
+            self.tracks.append(PersonTrack(self.next_id, boxes[j], pose, self.spec, self.target))
+            self.next_id += 1
+
+    def analyze(self, frame, t):
+        if not self.tracks or self.frames % self.detect_interval == 0:
+            self.detect(frame)
+        self.frames += 1
+        people = list(self.executor.map(lambda track: track.process(frame, t), self.tracks))
+
+        # Two tracks that ended up on the same person keep the older one
+        for i, track in enumerate(self.tracks):
+            for other in self.tracks[:i]:
+                if other.missed <= self.max_missed and box_overlap(track.box, other.box)[0, 0] > 0.7:
+                    track.missed = self.max_missed + 1
+                    break
+        for track in [track for track in self.tracks if track.missed > self.max_missed]:
+            self.drop(track)
+        return MultiPersonResult(frame, t, people)
+
+    def drop(self, track):
+        self.tracks.remove(track)
+        self.finished[track.id] = track.report()
+        self.gates[track.id] = track.gate.stats()
+        self.pool.release(track.pose)
+
+    def people(self):
+        """
+        Final counter state and rep analytics of everyone tracked so far, by
+        person id.
+        """
+        people = dict(self.finished)
+        people.update((track.id, track.report()) for track in self.tracks)
+        return dict(sorted(people.items()))
+
+    def quality(self):
+        """
+        QualityGate counts of every person tracked so far, by person id.
+        """
+        quality = dict(self.gates)
+        quality.update((track.id, track.gate.stats()) for track in self.tracks)
+        return dict(sorted(quality.items()))
+
+    def close(self):
+        self.executor.shutdown()
+        for track in list(self.tracks):
+            self.drop(track)
+
+
+def class_state(people):
+    """
+    The counter states of everyone in view as one state, each person's
+    tracks named 'person <id>' (plus the track name when they have several),
+    complete once everyone in view is.
+    """
+    state = {'counts': {}, 'stages': {}, 'form_message': None, 'complete': bool(people)}
+    for person in people:
+        counts = person.state['counts']
+        for track, count in counts.items():
+            name = 'person %d' % person.id if len(counts) == 1 else 'person %d %s' % (person.id, track)
+            state['counts'][name] = count
+            state['stages'][name] = person.state['stages'].get(track)
+        if person.state['form_message'] and state['form_message'] is None:
+            state['form_message'] = 'Person %d: %s' % (person.id, person.state['form_message'])
+        state['complete'] = state['complete'] and person.state['complete']
+    return state
+
+
+def run_class(exercise, target, on_frame=None, max_people=MAX_PEOPLE, detect_interval=DETECT_INTERVAL,
+              watchdog=None):
+    """
+    Count reps for a whole class in front of the local webcam until the user
+    presses 'x'. Returns every person's counter state under 'people', by
+    person id, with their QualityGate counts under 'quality' and 'pipeline',
+    'capture', 'watchdog' and 'video' as in run_exercise(). 'complete' is
+    whether everyone tracked reached the target. on_frame gets the
+    class_state() of everyone in the frame.
+    """
+    spec = EXERCISES[exercise]
+    skeleton = SkeletonRenderer(LANDMARK_SPEC, CONNECTION_SPEC)
+    analyzer = MultiPersonAnalyzer(spec, target, max_people=max_people, detect_interval=detect_interval)
+
+    def draw(result):
+        draw_people(result.frame, spec, result.people, skeleton)
+        return any(person.points is not None for person in result.people), class_state(result.people)
+
+    # Each track takes its own pose graph from the pool as people show up
+    try:
+        session = run_session('class-' + exercise, analyzer.analyze, draw, on_frame, watchdog)
+    finally:
+        analyzer.close()
+
+    people = analyzer.people()
+    state = {
+        'people': people,
+        'complete': bool(people) and all(person['complete'] for person in people.values()),
+        'detections': analyzer.detections,
+        'quality': analyzer.quality(),
+    }
+    state.update(session)
+    return state
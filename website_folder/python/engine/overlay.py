@@ -0,0 +1,88 @@
+import cv2
+import mediapipe as mp
+
+from website_folder.python.engine.skeleton import SkeletonRenderer
+
+mp_drawing = mp.solutions.drawing_utils
+mp_pose = mp.solutions.pose
+
+LANDMARK_SPEC = mp_drawing.DrawingSpec(color=(0, 0, 0), thickness=4, circle_radius=3)  # Black dots
+CONNECTION_SPEC = mp_drawing.DrawingSpec(color=(220, 128, 255), thickness=3, circle_radius=2)  # Light purple lines
+SKELETON = SkeletonRenderer(LANDMARK_SPEC, CONNECTION_SPEC)
+
+# Status box
+COLOR_RECTANGLE = (10, 200, 200)
+COLOR_TEXT = (0, 0, 0)
+
+
+def draw_angle_labels(frame, spec, points, angles):
+    height, width = frame.shape[:2]
+    for index, text, anchor in spec.labels:
+        position = (int(points[anchor, 0] * width), int(points[anchor, 1] * height))
+        cv2.putText(frame, f"{text}: {int(angles[index])}", position,
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+
+
+def draw_status(frame, spec, state):
+    # One 200px box per counter, side by side
+    for i, track in enumerate(spec.tracks):
+        x = i * 205
+        cv2.rectangle(frame, (x, 0), (x + 200, 73), COLOR_RECTANGLE, -1)
+        cv2.putText(frame, track.label, (x + 10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLOR_TEXT, 1, cv2.LINE_AA)
+        if spec.counting == 'hold':
+            value = state['remaining']
+        else:
+            value = state['counts'][track.name]
+        if value is not None:
+            cv2.putText(frame, str(value), (x + 10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2, COLOR_TEXT, 2, cv2.LINE_AA)
+
+
+def draw_banner(frame, message, font, color):
+    # Centred text on a black background rectangle
+    text_size = cv2.getTextSize(message, font, 1, 2)[0]
+    text_x = int((frame.shape[1] - text_size[0]) / 2)
+    text_y = int((frame.shape[0] + text_size[1]) / 2)
+    cv2.rectangle(frame, (text_x - 10, text_y - text_size[1] - 10), (text_x + text_size[0] + 10, text_y + 10),
+                  (0, 0, 0), -1)
+    cv2.putText(frame, message, (text_x, text_y), font, 1, color, 2, cv2.LINE_AA)
+
+
+def draw_overlay(frame, spec, state, points, visible, angles, hud=None, skeleton=SKELETON):
+    """
+    Everything the exercise window shows on top of the camera frame, given a
+    snapshot of the counter state for that frame. With a HudCompositor the
+    status boxes and banners are copied from its cache instead of redrawn.
+    """
+    banner = hud.draw_banner if hud else draw_banner
+    if angles is not None:
+        draw_angle_labels(frame, spec, points, angles)
+        if state['form_message']:
+            banner(frame, state['form_message'], cv2.FONT_HERSHEY_SIMPLEX, (0, 0, 255))
+
+    if hud:
+        hud.draw_status(frame, state)
+    else:
+        draw_status(frame, spec, state)
+
+    # Rendering dots
+    skeleton.draw(frame, points, visible)
+
+    if state['complete']:
+        banner(frame, spec.complete_message, cv2.FONT_HERSHEY_TRIPLEX, (0, 255, 0))
+
+
+def draw_people(frame, spec, people, skeleton=SKELETON):
+    """
+    Skeleton, box and counter of every person of a multi-person frame.
+    """
+    for person in people:
+        skeleton.draw(frame, person.points, person.visible)
+        x, y, w, h = person.box.astype(int)
+        color = (0, 255, 0) if person.state['complete'] else COLOR_RECTANGLE
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        if spec.counting == 'hold':
+            value = person.state['remaining']
+        else:
+            value = '/'.join(str(count) for count in person.state['counts'].values())
+        label = "#%d  %s" % (person.id, '-' if value is None else value)
+        cv2.putText(frame, label, (x, max(y - 8, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
@@ -0,0 +1,157 @@
+import collections
+import threading
+import time
+
+from website_folder.python.engine.timing import StageTimer
+
+
+class LatestQueue:
+    """
+    Bounded hand-off between two pipeline stages. When full, put() either
+    discards the oldest item so the newest frame wins (live sources), or waits
+    for room (recorded sources, where every frame matters). Discarded items
+    are passed to on_drop.
+    """
+    def __init__(self, size=1, drop=True, on_drop=None):
+        self.items = collections.deque()
+        self.size = size
+        self.drop = drop
+        self.on_drop = on_drop
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            while not self.drop and len(self.items) >= self.size and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                dropped = item
+            elif len(self.items) >= self.size:
+                dropped = self.items.popleft()
+                self.dropped += 1
+            else:
+                dropped = None
+            if not self.closed:
+                self.items.append(item)
+                self.cond.notify_all()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+
+    def get(self):
+        """
+        Next item, or None once the queue is closed and drained.
+        """
+        with self.cond:
+            while not self.items and not self.closed:
+                self.cond.wait()
+            item = self.items.popleft() if self.items else None
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Pipeline:
+    """
+    Runs capture -> inference -> render as three stages joined by bounded
+    queues, so throughput is set by the slowest stage instead of the sum of all.
+
+    capture() returns a frame or None at the end of the source, and clock()
+    gives the timestamp of the frame just captured.
+    analyze(frame, t) returns whatever render needs.
+    render(item) returns False to stop the pipeline.
+    recycle(frame) is called with every captured frame once it has been
+    rendered or dropped, so the capture buffer can be reused.
+    Capture and inference run on worker threads; render runs on the calling
+    thread, since OpenCV windows must be driven from the main thread.
+    """
+    def __init__(self, capture, analyze, render, queue_size=1, drop=True, clock=time.time, recycle=None):
+        self.capture = capture
+        self.clock = clock
+        self.analyze = analyze
+        self.render = render
+        self.recycle = recycle
+        on_drop = (lambda item: recycle(item[0])) if recycle else None
+        # Both queues carry the frame first: (frame, t), then (frame, result)
+        self.frames = LatestQueue(queue_size, drop, on_drop)
+        self.results = LatestQueue(queue_size, drop, on_drop)
+        self.timers = {'capture': StageTimer(), 'inference': StageTimer(), 'render': StageTimer()}
+        self.stopped = threading.Event()
+        self.error = None
+
+    def capture_stage(self):
+        timer = self.timers['capture']
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            frame = self.capture()
+            if frame is None:
+                break
+            timer.since(start)
+            self.frames.put((frame, self.clock()))
+        self.frames.close()
+
+    def inference_stage(self):
+        timer = self.timers['inference']
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            start = time.perf_counter()
+            result = self.analyze(*item)
+            timer.since(start)
+            self.results.put((item[0], result))
+        self.results.close()
+
+    def guarded(self, stage):
+        try:
+            stage()
+        except Exception as e:
+            self.error = e
+            self.stop()
+
+    def stop(self):
+        self.stopped.set()
+        self.frames.close()
+        self.results.close()
+
+    def run(self):
+        workers = [threading.Thread(target=self.guarded, args=(stage,), daemon=True)
+                   for stage in (self.capture_stage, self.inference_stage)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        timer = self.timers['render']
+        rendered = 0
+        try:
+            while True:
+                item = self.results.get()
+                if item is None:
+                    break
+                frame, result = item
+                start = time.perf_counter()
+                keep_going = self.render(result)
+                timer.since(start)
+                rendered += 1
+                if self.recycle:
+                    self.recycle(frame)
+                if keep_going is False:
+                    break
+        finally:
+            self.stop()
+            for worker in workers:
+                worker.join()
+        if self.error is not None:
+            raise self.error
+
+        elapsed = time.perf_counter() - started
+        return {
+            'frames': rendered,
+            'fps': rendered / elapsed if elapsed else 0.0,
+            'dropped': {'inference': self.frames.dropped, 'render': self.results.dropped},
+            'timings': {name: timer.summary() for name, timer in self.timers.items()},
+        }
@@ -0,0 +1,115 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import mediapipe as mp
+import numpy as np
+
+mp_pose = mp.solutions.pose
+
+# Processing one blank frame opens the graph's calculators and loads the models,
+# which is most of the cost of the first real frame.
+WARM_UP_FRAME = np.zeros((256, 256, 3), np.uint8)
+
+
+class PoolExhausted(RuntimeError):
+    pass
+
+
+class PosePool:
+    """
+    Process-wide pool of warmed-up MediaPipe Pose graphs. Sessions check a
+    graph out for their whole lifetime and give it back when they end; it is
+    then reset and warmed up again in the background for the next user.
+    checkout() waits at most timeout seconds for a graph (the pool's own,
+    unless given) before raising PoolExhausted, which fails the job waiting.
+    """
+    def __init__(self, size=2, timeout=5, **options):
+        self.size = size
+        self.timeout = timeout
+        self.options = options or {'min_detection_confidence': 0.5, 'min_tracking_confidence': 0.5}
+        # Last in, first out, so a lightly loaded server keeps reusing the same graphs
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.size = app.config.get('POSE_POOL_SIZE', self.size)
+        self.timeout = app.config.get('POSE_POOL_TIMEOUT', self.timeout)
+
+    def create(self):
+        pose = mp_pose.Pose(**self.options)
+        pose.process(WARM_UP_FRAME)
+        return pose
+
+    def grow(self):
+        with self.lock:
+            if self.created >= self.size:
+                return None
+            self.created += 1
+        try:
+            return self.create()
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    def warm_up(self):
+        """
+        Create every graph of the pool up front.
+        """
+        while True:
+            pose = self.grow()
+            if pose is None:
+                return
+            self.idle.put(pose)
+
+    def acquire(self, timeout=None):
+        try:
+            pose = self.idle.get_nowait()
+        except queue.Empty:
+            pose = self.grow()
+            if pose is None:
+                try:
+                    pose = self.idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise PoolExhausted("All %d pose graphs are in use." % self.size)
+        with self.lock:
+            self.in_use += 1
+        return pose
+
+    def release(self, pose):
+        with self.lock:
+            self.in_use -= 1
+        threading.Thread(target=self.recycle, args=(pose,), daemon=True).start()
+
+    def recycle(self, pose):
+        # Drop the previous user's tracking state, then pay the graph restart now
+        # rather than on the next user's first frame
+        try:
+            pose.reset()
+            pose.process(WARM_UP_FRAME)
+        except Exception:
+            # A graph that cannot restart is dropped, and the next acquire()
+            # that finds none idle creates a new one in its place
+            with self.lock:
+                self.created -= 1
+            pose.close()
+            return
+        self.idle.put(pose)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        pose = self.acquire(self.timeout if timeout is None else timeout)
+        try:
+            yield pose
+        finally:
+            self.release(pose)
+
+    def stats(self):
+        with self.lock:
+            return {'size': self.size, 'created': self.created, 'in_use': self.in_use, 'idle': self.idle.qsize()}
+
+
+pose_pool = PosePool()
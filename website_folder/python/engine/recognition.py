@@ -0,0 +1,317 @@
+"""
+Recognise which exercise is being done from the last couple of seconds of
+landmarks, so a session started on the wrong exercise switches to the right
+one by itself.
+
+Every frame is reduced to a few numbers (the main joint angles, how far the
+torso leans, how high the wrists are and how wide the feet), and a window of
+frames to the mean and spread of each. A k-nearest-neighbour model over
+windows cut from labelled landmark recordings (see recording.py) names the
+exercise.
+
+    python -m website_folder.python.engine.recognition train squat-*.landmarks pushup-*.landmarks --output model.npz
+    python -m website_folder.python.engine.recognition evaluate model.npz held-out-*.landmarks
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.landmarks import LANDMARK_INDEX, X, Y, AngleKernel
+from website_folder.python.engine.recording import Recording
+from website_folder.python.engine.specs import EXERCISES
+from website_folder.python.engine.timing import StageTimer
+
+FEATURE_ANGLES = (
+    ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+    ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+    ('LEFT_HIP', 'LEFT_SHOULDER', 'LEFT_ELBOW'),
+    ('RIGHT_HIP', 'RIGHT_SHOULDER', 'RIGHT_ELBOW'),
+    ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE'),
+    ('RIGHT_SHOULDER', 'RIGHT_HIP', 'RIGHT_KNEE'),
+    ('LEFT_HIP', 'LEFT_KNEE', 'LEFT_ANKLE'),
+    ('RIGHT_HIP', 'RIGHT_KNEE', 'RIGHT_ANKLE'),
+)
+FEATURE_KERNEL = AngleKernel([[LANDMARK_INDEX[name] for name in triplet] for triplet in FEATURE_ANGLES])
+SHOULDERS = [LANDMARK_INDEX['LEFT_SHOULDER'], LANDMARK_INDEX['RIGHT_SHOULDER']]
+HIPS = [LANDMARK_INDEX['LEFT_HIP'], LANDMARK_INDEX['RIGHT_HIP']]
+WRISTS = [LANDMARK_INDEX['LEFT_WRIST'], LANDMARK_INDEX['RIGHT_WRIST']]
+ANKLES = [LANDMARK_INDEX['LEFT_ANKLE'], LANDMARK_INDEX['RIGHT_ANKLE']]
+NUM_FEATURES = len(FEATURE_ANGLES) + 3
+
+# Two seconds of frames at 30 fps, classified every half second
+WINDOW = 60
+INTERVAL = 15
+
+
+def frame_features(points):
+    """
+    Per-frame features of a (..., 33, 4) landmark array: the FEATURE_ANGLES
+    over 180 degrees, then the torso's lean from upright (0 standing, 1
+    lying), the wrists' height above the shoulders and the distance between
+    the ankles, both in torso lengths.
+    """
+    shoulders = points[..., SHOULDERS, :2].mean(axis=-2)
+    hips = points[..., HIPS, :2].mean(axis=-2)
+    torso = shoulders - hips
+    length = np.maximum(np.hypot(torso[..., X], torso[..., Y]), 1e-6)
+    lean = np.arctan2(np.abs(torso[..., X]), -torso[..., Y]) / (np.pi / 2)
+    lift = (shoulders[..., Y] - points[..., WRISTS, Y].mean(axis=-1)) / length
+    stance = np.abs(points[..., ANKLES[0], X] - points[..., ANKLES[1], X]) / length
+    return np.concatenate([FEATURE_KERNEL(points) / 180.0, np.stack([lean, lift, stance], axis=-1)], axis=-1)
+
+
+def window_features(features):
+    """
+    Mean and standard deviation of every feature over the frames of a
+    window, (frames, NUM_FEATURES) to 2 * NUM_FEATURES.
+    """
+    return np.concatenate([features.mean(axis=0), features.std(axis=0)])
+
+
+def recording_windows(recording, window=WINDOW, step=INTERVAL):
+    """
+    Window features of a recording, one every step frames, leaving out
+    windows where nobody was detected for half the frames or more.
+    """
+    features = frame_features(np.asarray(recording.points, np.float32))
+    windows = []
+    for start in range(0, len(recording) - window + 1, step):
+        valid = recording.valid[start:start + window]
+        if valid.sum() * 2 > window:
+            windows.append(window_features(features[start:start + window][valid]))
+    return np.array(windows, np.float32).reshape(-1, 2 * NUM_FEATURES)
+
+
+class ExerciseClassifier:
+    """
+    k-nearest-neighbour vote over standardised window features, keeping at
+    most max_per_class training windows per exercise so a prediction stays
+    one small matrix operation. predict() returns (exercise, share of the k
+    votes it got).
+    """
+    def __init__(self, k=5, max_per_class=200):
+        self.k = k
+        self.max_per_class = max_per_class
+        self.classes = []
+        self.windows = None
+        self.labels = None
+        self.mean = None
+        self.scale = None
+
+    def fit(self, windows, labels, seed=0):
+        rng = np.random.default_rng(seed)
+        labels = np.asarray(labels)
+        self.classes = sorted(set(labels.tolist()))
+        keep = []
+        for name in self.classes:
+            index = np.flatnonzero(labels == name)
+            if len(index) > self.max_per_class:
+                index = rng.choice(index, self.max_per_class, replace=False)
+            keep.append(index)
+        keep = np.concatenate(keep)
+        windows = np.asarray(windows, np.float32)[keep]
+        self.mean = windows.mean(axis=0)
+        self.scale = np.maximum(windows.std(axis=0), 1e-3)
+        self.windows = (windows - self.mean) / self.scale
+        self.labels = np.searchsorted(self.classes, labels[keep])
+        return self
+
+    def predict(self, window):
+        distances = np.square(self.windows - (window - self.mean) / self.scale).sum(axis=1)
+        k = min(self.k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        votes = np.bincount(self.labels[nearest], minlength=len(self.classes))
+        best = int(votes.argmax())
+        return self.classes[best], votes[best] / k
+
+    def save(self, path):
+        np.savez_compressed(path, windows=self.windows, labels=self.labels, mean=self.mean, scale=self.scale,
+                            classes=np.array(self.classes), k=self.k)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            classifier = cls(int(data['k']))
+            classifier.windows = data['windows']
+            classifier.labels = data['labels']
+            classifier.mean = data['mean']
+            classifier.scale = data['scale']
+            classifier.classes = data['classes'].tolist()
+        return classifier
+
+
+class ExerciseRecognizer:
+    """
+    Ring buffer of the features of the last window frames, classified every
+    interval frames. add() takes a frame's landmarks (None when nobody was
+    detected) and returns the exercise recognised so far, which only changes
+    once agree classifications in a row name the same exercise with at least
+    min_confidence of the votes.
+    """
+    def __init__(self, classifier, window=WINDOW, interval=INTERVAL, min_confidence=0.6, agree=2):
+        self.classifier = classifier
+        self.window = window
+        self.interval = interval
+        self.min_confidence = min_confidence
+        self.agree = agree
+        self.features = np.full((window, NUM_FEATURES), np.nan, np.float32)
+        self.frames = 0
+        self.candidate = None
+        self.streak = 0
+        self.exercise = None
+        self.timers = {'features': StageTimer(), 'classify': StageTimer()}
+
+    def add(self, points):
+        start = time.perf_counter()
+        row = self.features[self.frames % self.window]
+        if points is None:
+            row[:] = np.nan
+        else:
+            row[:] = frame_features(points)
+        self.frames += 1
+        self.timers['features'].since(start)
+        if self.frames >= self.window and self.frames % self.interval == 0:
+            self.classify()
+        return self.exercise
+
+    def classify(self):
+        start = time.perf_counter()
+        valid = ~np.isnan(self.features).any(axis=1)
+        if valid.sum() * 2 <= self.window:
+            self.candidate, self.streak = None, 0
+            return
+        exercise, confidence = self.classifier.predict(window_features(self.features[valid]))
+        self.timers['classify'].since(start)
+        if confidence < self.min_confidence:
+            self.candidate, self.streak = None, 0
+            return
+        self.streak = self.streak + 1 if exercise == self.candidate else 1
+        self.candidate = exercise
+        if self.streak >= self.agree:
+            self.exercise = exercise
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'exercise': self.exercise,
+            'timings': {name: timer.summary() for name, timer in self.timers.items()},
+        }
+
+
+class RecognizingAnalyzer:
+    """
+    A FrameAnalyzer whose counter follows the recogniser: the session starts
+    counting the exercise it was started with, and once the recogniser
+    settles on another one, that exercise's counter (a fresh one the first
+    time) is swapped in. Each frame's state says which exercise counted it.
+    The target is reps, or seconds for a hold, so the counter never switches
+    between a hold and an exercise counted in reps.
+    """
+    def __init__(self, analyzer, recognizer, target):
+        self.analyzer = analyzer
+        self.recognizer = recognizer
+        self.target = target
+        self.counters = {analyzer.counter.spec.name: analyzer.counter}
+        self.switches = []
+
+    @property
+    def counter(self):
+        return self.analyzer.counter
+
+    def analyze(self, frame, t):
+        result = self.analyzer.analyze(frame, t)
+        result.state['exercise'] = self.analyzer.counter.spec.name
+        exercise = self.recognizer.add(result.points)
+        current = self.analyzer.counter.spec
+        if exercise is not None and exercise != current.name and \
+                (EXERCISES[exercise].counting == 'hold') == (current.counting == 'hold'):
+            if exercise not in self.counters:
+                self.counters[exercise] = RepCounter(EXERCISES[exercise], self.target)
+            self.analyzer.counter = self.counters[exercise]
+            self.switches.append({'exercise': exercise, 'frame': self.recognizer.frames, 't': t})
+        return result
+
+    def report(self):
+        report = self.recognizer.stats()
+        report['switches'] = self.switches
+        report['counts'] = {name: counter.state()['counts'] for name, counter in self.counters.items()}
+        return report
+
+
+class RecognitionSettings:
+    """
+    The recognition model sessions use, from the app config. Without a
+    model, sessions count the exercise they were started with throughout.
+    """
+    def __init__(self, model=None, window=WINDOW, interval=INTERVAL):
+        self.model = model
+        self.window = window
+        self.interval = interval
+        self.classifier = None
+
+    def init_app(self, app):
+        self.model = app.config.get('RECOGNITION_MODEL', self.model)
+        self.interval = app.config.get('RECOGNITION_INTERVAL', self.interval)
+        self.classifier = None
+
+    def create(self):
+        if not self.model:
+            return None
+        if self.classifier is None:
+            self.classifier = ExerciseClassifier.load(self.model)
+        return ExerciseRecognizer(self.classifier, self.window, self.interval)
+
+
+recognition = RecognitionSettings()
+
+
+def labelled_windows(paths, window=WINDOW, step=INTERVAL):
+    windows, labels = [], []
+    for path in paths:
+        recording = Recording(path)
+        exercise = recording.meta.get('exercise')
+        if exercise not in EXERCISES:
+            raise ValueError("%s was recorded without an exercise" % path)
+        found = recording_windows(recording, window, step)
+        windows.append(found)
+        labels.extend([exercise] * len(found))
+    return np.concatenate(windows), labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help="fit a model to labelled landmark recordings")
+    train.add_argument('paths', nargs='+', help="recording directories made with an exercise")
+    train.add_argument('--output', required=True, help=".npz file to write the model to")
+    train.add_argument('--k', type=int, default=5)
+    train.add_argument('--max-per-class', type=int, default=200)
+    evaluate = commands.add_parser('evaluate', help="score a model on labelled landmark recordings")
+    evaluate.add_argument('model')
+    evaluate.add_argument('paths', nargs='+', help="recording directories made with an exercise")
+    args = parser.parse_args()
+
+    windows, labels = labelled_windows(args.paths)
+    if args.command == 'train':
+        classifier = ExerciseClassifier(args.k, args.max_per_class).fit(windows, labels)
+        classifier.save(args.output)
+        print(json.dumps({'model': args.output, 'windows': dict(zip(*np.unique(labels, return_counts=True)))},
+                         indent=2, default=int))
+        return
+
+    classifier = ExerciseClassifier.load(args.model)
+    confusion = {}
+    for features, label in zip(windows, labels):
+        predicted = classifier.predict(features)[0]
+        confusion.setdefault(label, {}).setdefault(predicted, 0)
+        confusion[label][predicted] += 1
+    correct = sum(row.get(label, 0) for label, row in confusion.items())
+    print(json.dumps({'windows': len(labels), 'accuracy': correct / len(labels) if labels else None,
+                      'confusion': confusion}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Landmark recordings: run MediaPipe over a workout once, then replay the
+landmarks through any exercise spec as often as needed.
+
+A recording is a directory of flat little-endian columns plus metadata:
+
+    points.f32   (frames, 33, 4) x, y, z, visibility
+    t.f64        (frames,) frame time in seconds
+    valid.u8     (frames,) 1 where somebody was detected
+    meta.json    format version and whatever the recorder was given
+
+Columns are appended frame by frame and replayed through np.memmap, so an
+interrupted recording is still readable up to its last whole frame.
+
+    python -m website_folder.python.engine.recording squat-1.landmarks --exercise squat
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.gate import QualityGate
+from website_folder.python.engine.landmarks import NUM_LANDMARKS
+from website_folder.python.engine.specs import EXERCISES
+
+FORMAT_VERSION = 1
+COLUMNS = {
+    'points': ('points.f32', np.dtype('<f4'), (NUM_LANDMARKS, 4)),
+    't': ('t.f64', np.dtype('<f8'), ()),
+    'valid': ('valid.u8', np.dtype('u1'), ()),
+}
+MISSING_POINTS = np.full((NUM_LANDMARKS, 4), np.nan, '<f4')
+
+
+class LandmarkRecorder:
+    """
+    Appends one frame of landmarks at a time to a recording directory.
+    add() takes the (33, 4) landmark array, or None when nobody was detected.
+    """
+    def __init__(self, path, **meta):
+        self.path = path
+        self.meta = dict(meta, version=FORMAT_VERSION)
+        self.frames = 0
+        os.makedirs(path, exist_ok=True)
+        self.files = {name: open(os.path.join(path, filename), 'wb')
+                      for name, (filename, _, _) in COLUMNS.items()}
+        self.write_meta()
+
+    def add(self, points, t):
+        if points is None:
+            self.files['points'].write(MISSING_POINTS.tobytes())
+        else:
+            self.files['points'].write(np.asarray(points, '<f4').tobytes())
+        self.files['t'].write(np.float64(t).astype('<f8').tobytes())
+        self.files['valid'].write(b'\x00' if points is None else b'\x01')
+        self.frames += 1
+
+    def write_meta(self):
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(dict(self.meta, frames=self.frames), f, indent=2)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    Read-only, memory-mapped view of a recording. Nothing is read from disk
+    until a column is indexed.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError("Unsupported landmark recording version %r" % self.meta.get('version'))
+
+        # Trust the column sizes over meta.json, which is rewritten only on close
+        sizes = {name: os.path.getsize(os.path.join(path, filename)) // (dtype.itemsize * int(np.prod(shape)))
+                 for name, (filename, dtype, shape) in COLUMNS.items()}
+        self.frames = min(sizes.values())
+        for name, (filename, dtype, shape) in COLUMNS.items():
+            column = self.map(filename, dtype, (self.frames,) + shape)
+            setattr(self, name, column)
+        self.valid = self.valid.view(bool)
+
+    def map(self, filename, dtype, shape):
+        if not shape[0]:
+            return np.empty(shape, dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype, 'r', shape=shape)
+
+    def __len__(self):
+        return self.frames
+
+    def angles(self, spec, start=0, stop=None):
+        """
+        The spec's joint angles for frames [start, stop), NaN where nobody was detected.
+        """
+        return spec.kernel(self.points[start:stop])
+
+    def replay(self, counter, chunk=1 << 16, gate=None):
+        """
+        Feed every frame through counter in chunks and return, per track, the
+        frame indices where reps were counted. Frames are admitted by gate (a
+        fresh QualityGate by default) as they would be live, so frames whose
+        measured joints are not all visible are not counted.
+        """
+        spec = counter.spec
+        gate = gate or QualityGate()
+        reps = {name: [] for name in counter.counts}
+        for start in range(0, self.frames, chunk):
+            stop = min(start + chunk, self.frames)
+            valid = gate.admit_many(spec, self.points[start:stop], self.valid[start:stop])
+            counted = counter.update_many(self.angles(spec, start, stop), self.t[start:stop], valid)
+            for name, frames in counted.items():
+                reps[name].append(frames + start)
+        return {name: np.concatenate(frames) if frames else np.empty(0, np.intp)
+                for name, frames in reps.items()}
+
+
+def replay_report(path, exercise, target=None):
+    recording = Recording(path)
+    counter = RepCounter(EXERCISES[exercise], float('inf') if target is None else target)
+    gate = QualityGate()
+    started = time.perf_counter()
+    reps = recording.replay(counter, gate=gate)
+    elapsed = time.perf_counter() - started
+    state = counter.state()
+    return {
+        'recording': path,
+        'exercise': exercise,
+        'target': target,
+        'frames': len(recording),
+        'counts': state['counts'],
+        'complete': state['complete'],
+        'quality': gate.stats(),
+        'reps': {name: [{'frame': int(i), 't': float(recording.t[i])} for i in frames]
+                 for name, frames in reps.items()},
+        'frames_per_second': len(recording) / elapsed if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help="recording directories")
+    parser.add_argument('--exercise', choices=sorted(EXERCISES),
+                        help="spec to replay through, default the one the recording was made with")
+    parser.add_argument('--target', type=int)
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.paths:
+        exercise = args.exercise or Recording(path).meta.get('exercise')
+        if exercise not in EXERCISES:
+            parser.error("%s was recorded without an exercise, pass --exercise" % path)
+        reports.append(replay_report(path, exercise, args.target))
+    print(json.dumps({'recordings': reports}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+
+from website_folder.python.engine.buffers import RgbBuffer
+from website_folder.python.engine.landmarks import X, Y, Z
+
+# The crop is the landmarks' box grown on every side by this fraction of its longer side
+ROI_MARGIN = 0.25
+# Side of the pose landmark model's input; crops are scaled down until the
+# person is about this size, since the graph would shrink them to it anyway
+MODEL_INPUT = 256
+# A crop this large a fraction of the frame saves nothing, use the whole frame
+FULL_FRAME = 0.8
+# Fewer visible landmarks than this do not say where the person is
+MIN_VISIBLE = 4
+
+
+class RegionOfInterest:
+    """
+    Pose inference on a crop around where the person was in the previous
+    frame instead of the whole frame. process() returns (pose_landmarks,
+    points, visible) with points mapped back to full-frame coordinates;
+    pose_landmarks stays relative to the image the graph was given.
+
+    When nobody is found, the next frame goes to the graph whole so its own
+    person detector can find them again. The crop only moves once the
+    landmarks get near its edge or it has grown far too large for them, so
+    the graph's tracking and smoothing see a steady view.
+    """
+    def __init__(self, pose, buffer, margin=ROI_MARGIN):
+        self.pose = pose
+        self.buffer = buffer
+        self.margin = margin
+        self.rgb = RgbBuffer()
+        self.box = None
+        self.frames = 0
+        self.cropped = 0
+        self.pixels = 0.0
+
+    def process(self, frame):
+        result = self.infer(frame)
+        if result[1] is None and self.box is not None:
+            # Lost them in the crop; look at the whole frame straight away
+            self.box = None
+            result = self.infer(frame)
+        self.follow(result[1], result[2], frame.shape)
+        return result
+
+    def infer(self, frame):
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.box or (0, 0, width, height)
+        scale = 1.0
+        if self.box is not None:
+            scale = MODEL_INPUT * (1 + 2 * self.margin) / max(x1 - x0, y1 - y0)
+            self.cropped += 1
+        image = self.rgb.convert(frame[y0:y1, x0:x1], scale)
+        self.frames += 1
+        self.pixels += image.shape[0] * image.shape[1] / (width * height)
+
+        pose_landmarks = self.pose.process(image).pose_landmarks
+        points = visible = None
+        if pose_landmarks:
+            points = self.buffer.fill(pose_landmarks).copy()
+            if self.box is not None:
+                points[:, X] = (points[:, X] * (x1 - x0) + x0) / width
+                points[:, Y] = (points[:, Y] * (y1 - y0) + y0) / height
+                points[:, Z] *= (x1 - x0) / width
+            visible = self.buffer.visible()
+        return pose_landmarks, points, visible
+
+    def follow(self, points, visible, shape):
+        if points is None or visible.sum() < MIN_VISIBLE:
+            self.box = None
+            return
+        height, width = shape[:2]
+        xy = np.clip(points[visible][:, [X, Y]], 0, 1) * [width, height]
+        low, high = xy.min(axis=0), xy.max(axis=0)
+        grow = (high - low).max() * self.margin
+
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            inside = (low >= [x0 + grow / 2, y0 + grow / 2]).all() and (high <= [x1 - grow / 2, y1 - grow / 2]).all()
+            if inside and max(x1 - x0, y1 - y0) <= 2 * ((high - low).max() + 2 * grow):
+                return
+
+        x0, y0 = np.maximum(low - grow, 0).astype(int)
+        x1, y1 = np.minimum(high + grow, [width, height]).astype(int)
+        if (x1 - x0) * (y1 - y0) > FULL_FRAME * width * height:
+            self.box = None
+        else:
+            self.box = (x0, y0, x1, y1)
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'cropped_rate': self.cropped / self.frames if self.frames else 0.0,
+            'pixels_mean': self.pixels / self.frames if self.frames else 0.0,
+        }
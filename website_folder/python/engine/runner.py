@@ -0,0 +1,169 @@
+import time
+
+import cv2
+
+from website_folder.python.engine.adaptive import KeyframeScheduler
+from website_folder.python.engine.analyzer import FrameAnalyzer
+from website_folder.python.engine.buffers import FramePool
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.hud import HudCompositor
+from website_folder.python.engine.overlay import CONNECTION_SPEC, LANDMARK_SPEC, draw_overlay
+from website_folder.python.engine.pipeline import Pipeline
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.recognition import RecognizingAnalyzer, recognition
+from website_folder.python.engine.skeleton import SkeletonRenderer
+from website_folder.python.engine.sources import camera
+from website_folder.python.engine.specs import EXERCISES
+from website_folder.python.engine.video import session_video, source_fps
+from website_folder.python.engine.watchdog import supervisor
+
+# Wait about a frame before reading again after the camera failed to deliver one
+RETRY_DELAY = 0.03
+
+
+def open_feed(watchdog):
+    """
+    Open the camera (see CameraSettings) and the window it is shown in.
+    Returns (cap, capture, frames): the CaptureSource, a capture() callable
+    for Pipeline, and the FramePool it reads into, whose release() is the
+    pipeline's recycle. Failed reads are retried until the watchdog gives up
+    on the camera, and the stream ends once the watchdog reaps the session.
+    """
+    # Get the screen dimensions
+    import pyautogui
+    screen_width, screen_height = pyautogui.size()
+
+    # VIDEO FEED
+    cap = camera.open()
+
+    try:
+        # Create a window with the desired dimensions
+        window_width = int(screen_width * 0.50)  # 50% of the screen width
+        window_height = int(screen_height * 0.65)  # 65% of the screen height
+        cv2.namedWindow('Mediapipe Feed', cv2.WINDOW_NORMAL)
+        cv2.resizeWindow('Mediapipe Feed', window_width, window_height)
+    except Exception:
+        close_feed(cap)
+        raise
+
+    frames = FramePool()
+
+    def capture():
+        while True:
+            frame = frames.read(cap)
+            if not watchdog.read(frame is not None) or watchdog.check():
+                return None
+            if frame is not None:
+                return frame
+            time.sleep(RETRY_DELAY)
+
+    return cap, capture, frames
+
+
+def show(frame, on_frame, state):
+    """
+    Display a finished frame. False when on_frame or the user asked to stop.
+    """
+    cv2.imshow('Mediapipe Feed', frame)
+    if on_frame and on_frame(state) is False:
+        return False
+
+    # Check if the user pressed 'x' to quit
+    key = cv2.waitKey(1)
+    return key & 0xFF != ord('x')
+
+
+def close_feed(cap):
+    cap.release()
+    cv2.destroyAllWindows()
+
+
+def run_session(name, analyze, draw, on_frame=None, watchdog=None):
+    """
+    Run analyze(frame, t) over the local webcam until the user presses 'x',
+    the watchdog (by default one with the supervisor's limits) ends it, or
+    on_frame(state) returns False. draw(result) annotates result.frame and
+    returns (person, state): whether anyone was seen, and the state passed
+    to on_frame. Callers take their pose graph before calling, so waiting
+    for one never holds the camera open. The video, when sessions are
+    recorded, is saved under name. Returns the 'pipeline', 'capture',
+    'watchdog' and, when recorded, 'video' reports.
+    """
+    watchdog = watchdog or supervisor.watch()
+    cap, capture, frames = open_feed(watchdog)
+    video = session_video.create(name, source_fps(cap))
+
+    def render(result):
+        person, state = draw(result)
+        watchdog.seen(person)
+        if video:
+            video.add(result.frame, result.t)
+        return show(result.frame, on_frame, state) and watchdog.check() is None
+
+    try:
+        report = Pipeline(capture, analyze, render, recycle=frames.release).run()
+    finally:
+        close_feed(cap)
+        if video:
+            video.close()
+
+    session = {
+        'pipeline': report,
+        'capture': cap.report(),
+        'watchdog': watchdog.summary(),
+    }
+    if video:
+        session['video'] = video.stats()
+    return session
+
+
+def run_exercise(exercise, target, budget=None, on_frame=None, watchdog=None, recognize=True):
+    """
+    Run one exercise on the local webcam until the user presses 'x', the
+    watchdog (by default one with the supervisor's limits) ends it, or
+    on_frame(state), called with the counter state of every displayed frame,
+    returns False. With a budget, pose inference only runs on that fraction
+    of frames (see KeyframeScheduler). With recognize and a recognition model
+    configured, counting switches to whichever exercise the user is doing.
+    Returns the final counter state, with:
+      'pipeline'     frame rate, dropped frames and per-stage timings
+      'capture'      the camera's negotiated settings and measured frame rate
+      'quality'      how many frames passed the QualityGate
+      'analytics'    tempo, range of motion and symmetry (see RepAnalytics)
+      'watchdog'     why the exercise ended
+      'exercise'     the exercise counted, when recognising
+      'recognition'  the switches between exercises, when recognising
+      'inference'    keyframe stats, with a budget
+      'video'        frames recorded and dropped, when sessions are recorded
+    """
+    spec = EXERCISES[exercise]
+    counter = RepCounter(spec, target)
+    scheduler = KeyframeScheduler(budget) if budget else None
+    huds = {exercise: HudCompositor(spec)}
+    skeleton = SkeletonRenderer(LANDMARK_SPEC, CONNECTION_SPEC)
+    recognizer = recognition.create() if recognize else None
+
+    def draw(result):
+        shown = EXERCISES[result.state.get('exercise', exercise)]
+        if shown.name not in huds:
+            huds[shown.name] = HudCompositor(shown)
+        draw_overlay(result.frame, shown, result.state, result.points, result.visible, result.angles,
+                     huds[shown.name], skeleton)
+        return result.points is not None, result.state
+
+    with pose_pool.checkout() as pose:
+        analyzer = FrameAnalyzer(pose, counter, scheduler)
+        counting = RecognizingAnalyzer(analyzer, recognizer, target) if recognizer else analyzer
+        session = run_session(exercise, counting.analyze, draw, on_frame, watchdog)
+
+    counter = analyzer.counter
+    state = counter.state()
+    state['quality'] = analyzer.gate.stats()
+    state['analytics'] = counter.analytics.report()
+    if recognizer:
+        state['exercise'] = counter.spec.name
+        state['recognition'] = counting.report()
+    if scheduler:
+        state['inference'] = scheduler.stats()
+    state.update(session)
+    return state
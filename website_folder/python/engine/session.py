@@ -0,0 +1,315 @@
+import struct
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from website_folder.python.engine.analyzer import FrameAnalyzer
+from website_folder.python.engine.counter import RepCounter
+from website_folder.python.engine.events import EventChannel
+from website_folder.python.engine.gate import QualityGate
+from website_folder.python.engine.landmarks import NUM_LANDMARKS
+from website_folder.python.engine.pool import pose_pool
+from website_folder.python.engine.specs import EXERCISES
+from website_folder.python.engine.watchdog import supervisor
+
+# Frames pushed in one streaming request are length-prefixed:
+# a 4 byte big-endian size followed by that many bytes of JPEG.
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+
+# Landmarks computed on the client arrive as JSON, or as packed records of a
+# little-endian float64 frame time and 33 x, y, z, visibility float32s.
+# NaN coordinates mark a frame where nobody was detected.
+LANDMARK_RECORD = np.dtype([('t', '<f8'), ('points', '<f4', (NUM_LANDMARKS, 4))])
+MAX_LANDMARK_FRAMES = 10000
+DEFAULT_FRAME_INTERVAL = 1 / 30
+# Seconds between sweeps for sessions whose watchdog has run out
+REAP_INTERVAL = 5
+
+
+class FrameError(ValueError):
+    pass
+
+
+def read_frames(stream):
+    """
+    Yield the JPEG payloads of a length-prefixed frame stream until it ends.
+    """
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            raise FrameError("Truncated frame header.")
+        size, = FRAME_HEADER.unpack(header)
+        if size > MAX_FRAME_BYTES:
+            raise FrameError("Frame of %d bytes exceeds the limit." % size)
+        data = stream.read(size)
+        if len(data) < size:
+            raise FrameError("Truncated frame payload.")
+        yield data
+
+
+def decode_jpeg(data):
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise FrameError("Frame is not a decodable image.")
+    return frame
+
+
+def parse_landmarks_binary(data):
+    if not data or len(data) % LANDMARK_RECORD.itemsize:
+        raise FrameError("Landmark body must be whole %d byte records." % LANDMARK_RECORD.itemsize)
+    records = np.frombuffer(data, LANDMARK_RECORD)
+    if len(records) > MAX_LANDMARK_FRAMES:
+        raise FrameError("At most %d frames per request." % MAX_LANDMARK_FRAMES)
+    return records['points'], records['t']
+
+
+def parse_landmarks_json(data):
+    """
+    {"landmarks": [[[x, y, z, visibility] * 33] or null per frame], "t": [...]}
+    with "t" optional.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('landmarks'), list):
+        raise FrameError("Expected a 'landmarks' list.")
+    frames = data['landmarks']
+    if not frames or len(frames) > MAX_LANDMARK_FRAMES:
+        raise FrameError("Send between 1 and %d frames per request." % MAX_LANDMARK_FRAMES)
+    missing = [[np.nan] * 4] * NUM_LANDMARKS
+    try:
+        points = np.array([missing if frame is None else frame for frame in frames], np.float32)
+        t = None if data.get('t') is None else np.array(data['t'], np.float64)
+    except (TypeError, ValueError):
+        raise FrameError("Each frame must be 33 [x, y, z, visibility] rows or null.")
+    if points.shape != (len(frames), NUM_LANDMARKS, 4):
+        raise FrameError("Each frame must be 33 [x, y, z, visibility] rows or null.")
+    if t is not None and t.shape != (len(frames),):
+        raise FrameError("'t' must have one time per frame.")
+    return points, t
+
+
+def check_times(t, last_t=None):
+    """
+    Frame times must be finite and never go back, neither within a batch nor
+    before the last frame the session already counted.
+    """
+    if not np.isfinite(t).all():
+        raise FrameError("Frame times must be finite numbers.")
+    if np.any(np.diff(t) < 0) or last_t is not None and t[0] < last_t:
+        raise FrameError("Frame times must not decrease.")
+
+
+class PoseSession:
+    """
+    One trainee's exercise, driven by frames the client pushes to the server
+    instead of a webcam opened on the server itself. With inference=False
+    the client runs pose detection itself and pushes landmarks, so the
+    session needs no pose graph at all. The registry reaps the session once
+    its watchdog runs out, so an abandoned one does not keep its pose graph.
+    """
+    def __init__(self, exercise, target, timeout=None, inference=True, owner=None):
+        self.id = uuid.uuid4().hex
+        self.exercise = exercise
+        self.target = target
+        self.owner = owner
+        self.counter = RepCounter(EXERCISES[exercise], target)
+        self.pose = pose_pool.acquire(timeout) if inference else None
+        self.analyzer = FrameAnalyzer(self.pose, self.counter) if inference else None
+        self.gate = self.analyzer.gate if inference else QualityGate()
+        self.last_t = None
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.frames = 0
+        self.busy = 0.0
+        self.closed = False
+        self.events = EventChannel()
+        self.watchdog = supervisor.watch()
+
+    def check(self):
+        """
+        End the session once its watchdog runs out, so a client that keeps
+        streaming cannot keep it past its limits.
+        """
+        reason = self.watchdog.check()
+        if reason:
+            self.close()
+            raise FrameError("Session ended by its watchdog (%s)." % reason)
+
+    def process_jpeg(self, data, t=None):
+        if self.analyzer is None:
+            raise FrameError("This session takes landmarks, not video frames.")
+        self.check()
+        try:
+            frame = decode_jpeg(data)
+        except FrameError:
+            self.watchdog.read(False)
+            raise
+        self.watchdog.read(True)
+        with self.lock:
+            if self.closed:
+                raise FrameError("Session is closed.")
+            begin = time.perf_counter()
+            result = self.analyzer.analyze(frame, time.time() if t is None else t)
+            self.busy += time.perf_counter() - begin
+            self.frames += 1
+            state = result.state
+            state['frame'] = self.frames
+            state['person'] = result.points is not None
+            self.watchdog.seen(state['person'])
+            self.events.publish(state)
+            return state
+
+    def process_landmarks(self, points, t=None):
+        """
+        Count a batch of (N, 33, 4) landmark frames in one go. Without times
+        the frames are taken to be DEFAULT_FRAME_INTERVAL apart. Returns the
+        state after the batch, with the session frame numbers of the reps it
+        counted and how many of its frames drew each form warning. Frames
+        whose measured joints are not all visible are not counted.
+        """
+        self.check()
+        spec = self.counter.spec
+        present = ~np.isnan(points).any(axis=(1, 2))
+        with self.lock:
+            if self.closed:
+                raise FrameError("Session is closed.")
+            begin = time.perf_counter()
+            if t is None:
+                start = time.time() if self.last_t is None else self.last_t + DEFAULT_FRAME_INTERVAL
+                t = start + np.arange(len(points)) * DEFAULT_FRAME_INTERVAL
+            check_times(t, self.last_t)
+            valid = self.gate.admit_many(spec, points, present)
+            angles = spec.kernel(points)
+            counted = self.counter.update_many(angles, t, valid)
+            # Form is only checked up to the frame that completed the exercise
+            checked = valid.copy()
+            checked[self.counter.form_frames:] = False
+            fired = self.counter.form_many(angles, checked)
+            warnings = {}
+            for index, frames in zip(*np.unique(fired[fired >= 0], return_counts=True)):
+                warnings[spec.form_checks[index].message] = int(frames)
+            first = self.frames + 1
+            self.frames += len(points)
+            self.last_t = float(t[-1])
+            self.busy += time.perf_counter() - begin
+
+            state = self.counter.state()
+            state['frame'] = self.frames
+            state['person'] = bool(present[-1])
+            state['reps'] = {track: (frames + first).tolist() for track, frames in counted.items()}
+            state['warnings'] = warnings
+            self.watchdog.seen(present.any())
+            self.events.publish(state)
+            return state
+
+    def summary(self):
+        state = self.counter.state()
+        state.update({
+            'session_id': self.id,
+            'exercise': self.exercise,
+            'target': self.target,
+            'frames': self.frames,
+            'elapsed': time.time() - self.started,
+            'fps_per_core': self.frames / self.busy if self.busy else 0.0,
+            'watchdog': self.watchdog.summary(),
+            'quality': self.gate.stats(),
+            'analytics': self.counter.analytics.report(),
+        })
+        return state
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                if self.pose is not None:
+                    pose_pool.release(self.pose)
+                self.events.close()
+
+
+class SessionRegistry:
+    """
+    The open sessions. Abandoned ones are reaped every reap_interval seconds
+    by a background thread, started with the first session, so their pose
+    graphs go back to the pool even when no request comes in.
+    """
+    def __init__(self, reap_interval=REAP_INTERVAL):
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.busy = 0.0
+        self.reap_interval = reap_interval
+        self.reaper = None
+
+    def create(self, exercise, target, timeout=None, inference=True, owner=None):
+        # Abandoned sessions give their pose graphs back before a new one takes one
+        self.reap()
+        self.start_reaper()
+        session = PoseSession(exercise, target, timeout, inference, owner)
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id, owner=None):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None or owner is not None and session.owner != owner:
+            return None
+        if session.watchdog.check():
+            self.close(session_id)
+            return None
+        return session
+
+    def close(self, session_id, owner=None):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None or owner is not None and session.owner != owner:
+                return None
+            del self.sessions[session_id]
+        session.close()
+        with self.lock:
+            self.frames += session.frames
+            self.busy += session.busy
+        return session
+
+    def start_reaper(self):
+        with self.lock:
+            if self.reaper is not None:
+                return
+            self.reaper = threading.Thread(target=self.reap_forever, name='session-reaper', daemon=True)
+        self.reaper.start()
+
+    def reap_forever(self):
+        while True:
+            time.sleep(self.reap_interval)
+            self.reap()
+
+    def reap(self):
+        """
+        Close every session whose watchdog has run out.
+        """
+        with self.lock:
+            expired = [s.id for s in self.sessions.values() if s.watchdog.check()]
+        for session_id in expired:
+            self.close(session_id)
+        return len(expired)
+
+    def stats(self):
+        self.reap()
+        with self.lock:
+            sessions = list(self.sessions.values())
+            frames = self.frames + sum(s.frames for s in sessions)
+            busy = self.busy + sum(s.busy for s in sessions)
+        return {
+            'active_sessions': len(sessions),
+            'pose_pool': pose_pool.stats(),
+            'watchdog': supervisor.stats(),
+            'frames': frames,
+            'fps_per_core': frames / busy if busy else 0.0,
+        }
+
+
+sessions = SessionRegistry()
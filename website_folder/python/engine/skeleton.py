@@ -0,0 +1,108 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from website_folder.python.engine.landmarks import NUM_LANDMARKS, X, Y
+
+mp_drawing = mp.solutions.drawing_utils
+
+
+def joint_stamp(spec):
+    """
+    Pixel offsets and colours of one joint as mp_drawing draws it: a white
+    border circle with the spec's circle on top. Thick circles are polygons
+    around an integer centre, so the same pattern fits every joint.
+    """
+    border = max(spec.circle_radius + 1, int(spec.circle_radius * 1.2))
+    size = 2 * (border + spec.thickness) + 1
+    centre = (size // 2, size // 2)
+    canvas = np.zeros((size, size), np.uint8)
+    cv2.circle(canvas, centre, border, 1, spec.thickness)
+    cv2.circle(canvas, centre, spec.circle_radius, 2, spec.thickness)
+    rows, cols = np.nonzero(canvas)
+    colors = np.where((canvas[rows, cols] == 1)[:, None], mp_drawing.WHITE_COLOR, spec.color).astype(np.uint8)
+    return np.stack([rows - centre[1], cols - centre[0]], axis=1).astype(np.intp), colors
+
+
+class SkeletonRenderer:
+    """
+    Draws the pose skeleton from a landmark array the way
+    mp_drawing.draw_landmarks does, with one cv2.polylines call for the bones
+    and one indexed write for all the joints. Colours and sizes are fixed
+    when the renderer is created, along with the scratch arrays the joint
+    stamps are laid out in, so drawing a frame allocates next to nothing.
+    """
+    def __init__(self, landmark_spec, connection_spec, connections=mp.solutions.pose.POSE_CONNECTIONS,
+                 max_joints=NUM_LANDMARKS):
+        self.connections = np.array(list(connections), np.intp)
+        self.bone_color = connection_spec.color
+        self.bone_thickness = connection_spec.thickness
+        offsets, colors = joint_stamp(landmark_spec)
+        # The stamp of every joint, rows and columns apart so each is one
+        # contiguous (joints, stamp) block. Repeated rather than broadcast, and
+        # intp like the indices, since a ufunc that broadcasts or casts has
+        # numpy allocate a buffer as large as its output.
+        shape = (2, max_joints, len(offsets))
+        self.stamps = np.ascontiguousarray(np.broadcast_to(offsets.T[:, None, :], shape))
+        # One 3 byte value per pixel, so a whole stamp is written with np.put
+        self.colors = np.tile(np.ascontiguousarray(colors).view('V3').ravel(), max_joints)
+        # Scratch the joints are laid out in, filled in place every frame
+        pixels = max_joints * len(offsets)
+        self.joints = np.empty(shape, np.intp)
+        self.index = np.empty(pixels, np.intp)
+        self.on_frame = np.empty(pixels, bool)
+        self.bounds = np.empty(pixels, bool)
+        self.kept_index = np.empty(pixels, np.intp)
+        self.kept_colors = np.empty(pixels, self.colors.dtype)
+
+    def pixels(self, points, shape):
+        # Same rounding and bounds as mp_drawing's _normalized_to_pixel_coordinates
+        height, width = shape[:2]
+        xy = points[:, [X, Y]].astype(np.float64)
+        inside = ((xy >= 0) & (xy <= 1)).all(axis=1)
+        px = np.minimum(np.floor(xy * [width, height]), [width - 1, height - 1])
+        return np.where(inside[:, None], px, 0).astype(np.int32), inside
+
+    def draw(self, frame, points, visible):
+        """
+        points is a (33, 4) landmark array and visible the mask of landmarks
+        to draw; bones are drawn between visible landmarks only.
+        """
+        if points is None:
+            return
+        px, inside = self.pixels(points, frame.shape)
+        shown = visible & inside
+
+        bones = self.connections[shown[self.connections].all(axis=1)]
+        if len(bones):
+            cv2.polylines(frame, list(px[bones]), False, self.bone_color, self.bone_thickness)
+
+        # Joints in landmark order, each stamp overwriting the ones before it
+        centres = np.ascontiguousarray(px[shown].T[::-1, :, None], np.intp)
+        joints = self.joints[:, :centres.shape[1]]
+        np.copyto(joints, centres)
+        joints += self.stamps[:, :centres.shape[1]]
+        height, width = frame.shape[:2]
+        rows, cols = joints[0].reshape(-1), joints[1].reshape(-1)
+        n = len(rows)
+        on_frame, bounds, index = self.on_frame[:n], self.bounds[:n], self.index[:n]
+        np.greater_equal(rows, 0, out=on_frame)
+        np.less(rows, height, out=bounds)
+        on_frame &= bounds
+        np.greater_equal(cols, 0, out=bounds)
+        on_frame &= bounds
+        np.less(cols, width, out=bounds)
+        on_frame &= bounds
+        if not frame.flags.c_contiguous:
+            colors = self.colors[:n][on_frame]
+            frame[rows[on_frame], cols[on_frame]] = colors.view(np.uint8).reshape(-1, 3)
+            return
+        np.multiply(rows, width, out=index)
+        index += cols
+        kept = np.count_nonzero(on_frame)
+        if kept < n:
+            index = np.compress(on_frame, index, out=self.kept_index[:kept])
+            colors = np.compress(on_frame, self.colors[:n], out=self.kept_colors[:kept])
+        else:
+            colors = self.colors[:n]
+        np.put(frame.view('V3').reshape(-1), index, colors)
@@ -0,0 +1,214 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STREAM_SCHEMES = ('http://', 'https://', 'rtsp://', 'rtmp://', 'udp://', 'tcp://')
+
+
+def fourcc_name(value):
+    value = int(value)
+    return value.to_bytes(4, 'little').decode('ascii', 'replace') if value > 0 else None
+
+
+class CaptureSource:
+    """
+    Where frames come from, with the cv2.VideoCapture methods the engine
+    uses (read(image), get(), isOpened(), release()), plus report(): the
+    settings asked for, the ones the source actually gave, and the capture
+    frame rate measured over the reads so far. The settings are taken at the
+    first frame, so the report still has them after release().
+    """
+    kind = None
+
+    def __init__(self, cap, name, requested=None):
+        self.cap = cap
+        self.name = name
+        self.requested = requested or {}
+        self.settings = None
+        self.reads = 0
+        self.first_read = None
+        self.last_read = None
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if ret:
+            self.counted()
+        return ret, frame
+
+    def counted(self):
+        self.last_read = time.perf_counter()
+        if self.first_read is None:
+            self.first_read = self.last_read
+            self.settings = self.negotiated()
+        self.reads += 1
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+    def negotiated(self):
+        return {
+            'width': int(self.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self.get(cv2.CAP_PROP_FPS),
+            'fourcc': fourcc_name(self.get(cv2.CAP_PROP_FOURCC)),
+        }
+
+    def report(self):
+        span = (self.last_read - self.first_read) if self.reads > 1 else 0.0
+        return {
+            'source': self.name,
+            'kind': self.kind,
+            'requested': self.requested,
+            'negotiated': self.settings or self.negotiated(),
+            'frames': self.reads,
+            'measured_fps': (self.reads - 1) / span if span else 0.0,
+        }
+
+
+class DeviceSource(CaptureSource):
+    """
+    A local camera. The codec is asked for before the size, since V4L2
+    cameras only offer their larger sizes at full rate as MJPG instead of
+    raw YUYV. What the camera agreed to is read back, as it may not be what
+    was asked for.
+    """
+    kind = 'device'
+
+    def __init__(self, index=0, width=None, height=None, fps=None, fourcc='MJPG'):
+        cap = cv2.VideoCapture(index)
+        requested = {'width': width, 'height': height, 'fps': fps, 'fourcc': fourcc}
+        if fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        # Keep only the newest frame queued in the driver
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        super().__init__(cap, 'device %d' % index, requested)
+
+
+class FileSource(CaptureSource):
+    kind = 'file'
+
+    def __init__(self, path):
+        super().__init__(cv2.VideoCapture(path), path)
+
+
+class StreamSource(CaptureSource):
+    """
+    A network camera or stream URL (an IP webcam app, RTSP, MJPEG over HTTP)
+    read through FFmpeg, giving up on connecting or reading after timeout
+    seconds.
+    """
+    kind = 'stream'
+
+    def __init__(self, url, timeout=5.0):
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(timeout * 1000),
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(timeout * 1000)]
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        super().__init__(cap, url, {'timeout': timeout})
+
+
+class ImageDirectorySource(CaptureSource):
+    """
+    The images of a directory in name order, as frames fps apart. Images are
+    decoded into the buffer given to read() when it has the right size.
+    """
+    kind = 'images'
+
+    def __init__(self, path, fps=30.0):
+        self.paths = sorted(p for p in glob.glob(os.path.join(path, '*'))
+                            if p.lower().endswith(IMAGE_EXTENSIONS))
+        self.fps = fps
+        self.position = 0
+        self.shape = None
+        self.opened = True
+        super().__init__(None, path, {'fps': fps})
+
+    def read(self, image=None):
+        while self.opened and self.position < len(self.paths):
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is None:
+                continue
+            self.shape = frame.shape
+            if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+                np.copyto(image, frame)
+                frame = image
+            self.counted()
+            return True, frame
+        return False, None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(self.position - 1, 0) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self.shape:
+            return self.shape[1] if prop == cv2.CAP_PROP_FRAME_WIDTH else self.shape[0]
+        return 0.0
+
+    def isOpened(self):
+        return self.opened and bool(self.paths)
+
+    def release(self):
+        self.opened = False
+
+
+def open_source(source, **settings):
+    """
+    A CaptureSource for a device index (an int or a string of digits), a
+    directory of images, a stream URL or a video file. settings go to the
+    source's constructor.
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return DeviceSource(int(source), **settings)
+    if str(source).lower().startswith(STREAM_SCHEMES):
+        return StreamSource(source, **settings)
+    if os.path.isdir(source):
+        return ImageDirectorySource(source, **settings)
+    return FileSource(source)
+
+
+class CameraSettings:
+    """
+    The camera exercise sessions open, from the app config. Only device
+    sources are negotiated; the other settings are ignored for files.
+    """
+    def __init__(self, source=0, width=1280, height=720, fps=30, fourcc='MJPG'):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+
+    def init_app(self, app):
+        self.source = app.config.get('CAMERA_SOURCE', self.source)
+        self.width = app.config.get('CAMERA_WIDTH', self.width)
+        self.height = app.config.get('CAMERA_HEIGHT', self.height)
+        self.fps = app.config.get('CAMERA_FPS', self.fps)
+        self.fourcc = app.config.get('CAMERA_FOURCC', self.fourcc)
+
+    def open(self):
+        if isinstance(self.source, int) or str(self.source).isdigit():
+            return open_source(self.source, width=self.width, height=self.height, fps=self.fps, fourcc=self.fourcc)
+        return open_source(self.source)
+
+
+camera = CameraSettings()
@@ -0,0 +1,303 @@
+import numpy as np
+
+from website_folder.python.engine.landmarks import LANDMARK_INDEX, AngleKernel
+
+INF = float('inf')
+
+
+# Clauses compare one named joint angle against open bounds
+def above(angle, value):
+    return (angle, value, INF)
+
+
+def below(angle, value):
+    return (angle, -INF, value)
+
+
+def between(angle, low, high):
+    return (angle, low, high)
+
+
+class Track:
+    """
+    One rep counter of an exercise. The stage moves to stages[0] whenever every
+    'enter' clause holds, and a rep is counted when every 'count' clause holds
+    while in stages[0], which moves the stage on to stages[1]. concentric is
+    True when the movement from 'enter' to 'count' is the lift (a curl) and
+    False when it is the lowering (a squat), for rep analytics.
+    """
+    def __init__(self, name, label, enter=(), count=(), stages=('down', 'up'), concentric=True):
+        self.name = name
+        self.label = label
+        self.enter = enter
+        self.count = count
+        self.stages = stages
+        self.concentric = concentric
+
+
+class FormCheck:
+    """
+    Warning shown while every group has at least one clause that holds.
+    """
+    def __init__(self, message, *groups):
+        self.message = message
+        self.groups = groups
+
+
+class ExerciseSpec:
+    """
+    Everything that differs between exercises: the joint angles to measure, how
+    reps are counted and which form mistakes to flag.
+
+    counting is 'combined' (one counter over both sides), 'bilateral' (one
+    counter per side, all must reach the target) or 'hold' (the target is a
+    number of seconds spent with every clause of hold true).
+    """
+    def __init__(self, name, title, angles, counting, tracks=(), hold=(), form_checks=(),
+                 labels=(), complete_message="EXERCISE COMPLETED!"):
+        self.name = name
+        self.title = title
+        self.angle_names = tuple(angles)
+        self.triplets = tuple(tuple(LANDMARK_INDEX[p] for p in angles[n]) for n in self.angle_names)
+        self.kernel = AngleKernel(self.triplets)
+        # Every landmark the angles use, all of which must be visible to count a frame
+        self.joints = np.unique(self.triplets)
+        self.counting = counting
+        self.tracks = tracks
+        self.hold = hold
+        self.form_checks = form_checks
+        self.labels = tuple((self.angle_names.index(n), text, LANDMARK_INDEX[p]) for n, text, p in labels)
+        self.complete_message = complete_message
+
+        if counting == 'hold':
+            self.tracks = (Track('total', 'Time Remaining', stages=('hold',)),)
+        # Clauses refer to angles by index once compiled
+        for track in self.tracks:
+            track.enter = self.compile(track.enter)
+            track.count = self.compile(track.count)
+        self.hold = self.compile(hold)
+        for check in self.form_checks:
+            check.groups = tuple(self.compile(group) for group in check.groups)
+
+    def compile(self, clauses):
+        return tuple((self.angle_names.index(n), low, high) for n, low, high in clauses)
+
+
+EXERCISES = {spec.name: spec for spec in (
+    ExerciseSpec(
+        'bicep', 'Bicep',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+            'left_armpit': ('LEFT_ELBOW', 'LEFT_SHOULDER', 'LEFT_HIP'),
+            'right_armpit': ('RIGHT_ELBOW', 'RIGHT_SHOULDER', 'RIGHT_HIP'),
+        },
+        counting='bilateral',
+        tracks=(
+            Track('left', 'Left Reps',
+                  enter=(above('left_elbow', 160), below('left_armpit', 25)),
+                  count=(below('left_elbow', 40), below('left_armpit', 25))),
+            Track('right', 'Right Reps',
+                  enter=(above('right_elbow', 160), below('right_armpit', 25)),
+                  count=(below('right_elbow', 40), below('right_armpit', 25))),
+        ),
+        form_checks=(
+            FormCheck("FORM INCORRECT!", (above('left_armpit', 25), above('right_armpit', 25))),
+        ),
+        labels=(('left_elbow', 'Left', 'LEFT_ELBOW'), ('right_elbow', 'Right', 'RIGHT_ELBOW')),
+    ),
+    ExerciseSpec(
+        'pullup', 'Pullup',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(above('left_elbow', 150), above('right_elbow', 150)),
+                  count=(below('left_elbow', 30), below('right_elbow', 30))),
+        ),
+        labels=(('left_elbow', 'Left Arm', 'LEFT_ELBOW'), ('right_elbow', 'Right Arm', 'RIGHT_ELBOW')),
+    ),
+    ExerciseSpec(
+        'jumping_jack', 'Jumping Jacks',
+        angles={
+            'left_shoulder': ('LEFT_HIP', 'LEFT_SHOULDER', 'LEFT_ELBOW'),
+            'right_shoulder': ('RIGHT_HIP', 'RIGHT_SHOULDER', 'RIGHT_ELBOW'),
+            'left_hip': ('LEFT_KNEE', 'LEFT_HIP', 'RIGHT_HIP'),
+            'right_hip': ('RIGHT_KNEE', 'RIGHT_HIP', 'LEFT_HIP'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Jump Reps',
+                  enter=(above('left_shoulder', 65), above('right_shoulder', 65),
+                         above('left_hip', 95), above('right_hip', 95)),
+                  count=(below('left_shoulder', 30), below('right_shoulder', 30),
+                         below('left_hip', 93), below('right_hip', 93))),
+        ),
+        labels=(('left_shoulder', 'Left Angle', 'LEFT_ELBOW'), ('right_shoulder', 'Right Angle', 'RIGHT_ELBOW')),
+    ),
+    ExerciseSpec(
+        'bench_press', 'Bench Press',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(below('left_elbow', 100), below('right_elbow', 100)),
+                  count=(above('left_elbow', 155), above('right_elbow', 155))),
+        ),
+        form_checks=(
+            FormCheck("INCORRECT FORM!", (below('left_elbow', 40), below('right_elbow', 40))),
+        ),
+        labels=(('left_elbow', 'Left Arm', 'LEFT_ELBOW'), ('right_elbow', 'Right Arm', 'RIGHT_ELBOW')),
+    ),
+    ExerciseSpec(
+        'pushup', 'Pushup',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(above('left_elbow', 160), above('right_elbow', 160)),
+                  count=(below('left_elbow', 90), below('right_elbow', 90)),
+                  concentric=False),
+        ),
+        form_checks=(
+            FormCheck("INCORRECT FORM!", (below('left_elbow', 20), below('right_elbow', 20))),
+        ),
+        labels=(('left_elbow', 'Left Arm', 'LEFT_ELBOW'), ('right_elbow', 'Right Arm', 'RIGHT_ELBOW')),
+    ),
+    ExerciseSpec(
+        'crunches', 'Crunches',
+        angles={
+            'left_hip': ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE'),
+        },
+        counting='combined',
+        tracks=(
+            # A few degrees between the two, so jitter around 90 is not a rep
+            Track('total', 'Total Reps', enter=(above('left_hip', 95),), count=(below('left_hip', 90),)),
+        ),
+        labels=(('left_hip', 'Hip Angle', 'LEFT_HIP'),),
+    ),
+    ExerciseSpec(
+        'plank', 'Plank',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+            'left_hip': ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE'),
+            'right_hip': ('RIGHT_SHOULDER', 'RIGHT_HIP', 'RIGHT_KNEE'),
+        },
+        counting='hold',
+        hold=(between('left_elbow', 65, 115), between('right_elbow', 65, 115),
+              between('left_hip', 130, 180), between('right_hip', 130, 180)),
+        form_checks=(
+            FormCheck("FORM INCORRECT",
+                      (below('left_elbow', 40), below('right_elbow', 40)),
+                      (below('left_hip', 90), below('right_hip', 90))),
+        ),
+        labels=(('left_elbow', 'Left Arm', 'LEFT_ELBOW'), ('right_hip', 'Right Hip', 'RIGHT_HIP')),
+        complete_message="PLANK COMPLETE!",
+    ),
+    ExerciseSpec(
+        'leg_raise', 'Leg Raise',
+        angles={
+            'left_hip': ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE'),
+            'right_hip': ('RIGHT_SHOULDER', 'RIGHT_HIP', 'RIGHT_KNEE'),
+            'left_knee': ('LEFT_HIP', 'LEFT_KNEE', 'LEFT_ANKLE'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(above('left_hip', 160), above('right_hip', 160)),
+                  count=(below('left_hip', 90), below('right_hip', 90))),
+        ),
+        form_checks=(
+            FormCheck("INCORRECT FORM!", (below('left_knee', 50),)),
+        ),
+        labels=(('left_hip', 'Leg Angle', 'LEFT_KNEE'),),
+    ),
+    ExerciseSpec(
+        'lunges', 'Lunges',
+        angles={
+            'left_knee': ('LEFT_HIP', 'LEFT_KNEE', 'LEFT_ANKLE'),
+            'right_knee': ('RIGHT_HIP', 'RIGHT_KNEE', 'RIGHT_ANKLE'),
+        },
+        counting='bilateral',
+        tracks=(
+            Track('left', 'Left Reps',
+                  enter=(above('left_knee', 170), above('right_knee', 170)),
+                  count=(below('left_knee', 110), above('right_knee', 130)),
+                  stages=('center', 'left'), concentric=False),
+            Track('right', 'Right Reps',
+                  enter=(above('left_knee', 170), above('right_knee', 170)),
+                  count=(below('right_knee', 110), above('left_knee', 130)),
+                  stages=('center', 'right'), concentric=False),
+        ),
+        labels=(('left_knee', 'Left Knee', 'LEFT_KNEE'), ('right_knee', 'Right Knee', 'RIGHT_KNEE')),
+    ),
+    ExerciseSpec(
+        'squat', 'Squat',
+        angles={
+            'left_knee': ('LEFT_HIP', 'LEFT_KNEE', 'LEFT_ANKLE'),
+            'right_knee': ('RIGHT_HIP', 'RIGHT_KNEE', 'RIGHT_ANKLE'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(above('left_knee', 160), above('right_knee', 160)),
+                  count=(below('left_knee', 90), below('right_knee', 90)),
+                  stages=('up', 'down'), concentric=False),
+        ),
+        form_checks=(
+            FormCheck("SQUATTING TOO LOW!", (below('left_knee', 40), below('right_knee', 40))),
+        ),
+        labels=(('left_knee', 'Left Knee', 'LEFT_KNEE'), ('right_knee', 'Right Knee', 'RIGHT_KNEE')),
+    ),
+    ExerciseSpec(
+        'lateral_raise', 'Lateral Raise',
+        angles={
+            'left_shoulder': ('LEFT_HIP', 'LEFT_SHOULDER', 'LEFT_ELBOW'),
+            'right_shoulder': ('RIGHT_HIP', 'RIGHT_SHOULDER', 'RIGHT_ELBOW'),
+        },
+        counting='combined',
+        tracks=(
+            Track('total', 'Total Reps',
+                  enter=(below('left_shoulder', 20), below('right_shoulder', 20)),
+                  count=(above('left_shoulder', 70), above('right_shoulder', 70))),
+        ),
+        form_checks=(
+            FormCheck("INCORRECT FORM!", (above('left_shoulder', 95), above('right_shoulder', 95))),
+        ),
+        labels=(('left_shoulder', 'Left Arm', 'LEFT_SHOULDER'), ('right_shoulder', 'Right Arm', 'RIGHT_SHOULDER')),
+    ),
+    ExerciseSpec(
+        'shoulder_press', 'Shoulder Press',
+        angles={
+            'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+            'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+            'left_shoulder': ('LEFT_HIP', 'LEFT_SHOULDER', 'LEFT_ELBOW'),
+            'right_shoulder': ('RIGHT_HIP', 'RIGHT_SHOULDER', 'RIGHT_ELBOW'),
+        },
+        counting='bilateral',
+        tracks=(
+            Track('left', 'Left Reps',
+                  enter=(above('left_elbow', 110), above('left_shoulder', 80)),
+                  count=(below('left_elbow', 90), between('left_shoulder', 50, 80)),
+                  stages=('up', 'down'), concentric=False),
+            Track('right', 'Right Reps',
+                  enter=(above('right_elbow', 110), above('right_shoulder', 80)),
+                  count=(below('right_elbow', 90), between('right_shoulder', 50, 80)),
+                  stages=('up', 'down'), concentric=False),
+        ),
+        form_checks=(
+            FormCheck("FORM INCORRECT!", (below('left_shoulder', 65), below('right_shoulder', 65))),
+        ),
+        labels=(('left_elbow', 'Left', 'LEFT_ELBOW'), ('right_elbow', 'Right', 'RIGHT_ELBOW')),
+    ),
+)}
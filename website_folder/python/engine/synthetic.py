@@ -0,0 +1,306 @@
+"""
+Landmark sequences of a stick figure doing an exercise, for testing the
+counting logic at volume without a camera or a video.
+
+The figure is posed in the image plane by the same joint angles the specs
+measure (elbow, shoulder, hip and knee on each side), so a pose asked for is
+exactly the pose the counter sees, before the noise. Every rep eases from
+the rest pose to the peak pose and back, with its tempo jittered. Reps can
+be partial (never reaching the count position) or done with bad form, and
+frames can be dropped. Each sequence knows how many reps it should count
+and which form warnings it should raise, so counting can be checked.
+
+    python -m website_folder.python.engine.synthetic squat squat.landmarks --reps 20 --fps 30
+"""
+import argparse
+import json
+
+import numpy as np
+
+from website_folder.python.engine.landmarks import LANDMARK_INDEX, NUM_LANDMARKS
+from website_folder.python.engine.recording import LandmarkRecorder
+from website_folder.python.engine.specs import EXERCISES
+
+SIDES = ('left', 'right')
+JOINTS = ('elbow', 'shoulder', 'hip', 'knee')
+# Segment lengths as fractions of the frame height
+TORSO, UPPER_ARM, FOREARM, THIGH, SHIN = 0.25, 0.13, 0.12, 0.18, 0.17
+
+
+def expand(pose):
+    """
+    A pose as {'left_elbow': ..., ...}, from keys naming a joint on both
+    sides ('knee') or on one side ('left_knee').
+    """
+    full = {}
+    for side in SIDES:
+        for joint in JOINTS:
+            full[side + '_' + joint] = pose.get(side + '_' + joint, pose.get(joint))
+    return full
+
+
+class Motion:
+    """
+    How the figure does one exercise. rest is the pose between reps and
+    peaks the poses reps go to, taken in turn (lunges alternate legs); each
+    peak is (pose, tracks), the tracks it should count a rep on, or all of
+    them. bad overrides the peak pose for a rep with bad form, which raises
+    the spec's form warning and counts only with bad_counts. A partial rep
+    goes only partial of the way to the peak. lean is the torso's angle from
+    upright (90 lying), view 'front' or 'side', and signs the direction each
+    joint bends in, so the figure looks the part. For holds, a rep is
+    hold_seconds in the rest pose followed by a break in the peak pose, and
+    a partial rep a hold cut short to partial of that.
+    """
+    def __init__(self, rest, peaks, lean=0, view='front', bad=None, bad_counts=True, partial=0.35,
+                 signs=None, tempo=0.8, hold_seconds=None):
+        self.rest = expand(rest)
+        self.peaks = [(expand(dict(rest, **pose)), tracks) for pose, tracks in peaks]
+        self.lean = lean
+        self.view = view
+        self.bad = bad
+        self.bad_counts = bad_counts
+        self.partial = partial
+        self.signs = dict({'shoulder': 1, 'elbow': 1, 'hip': 1, 'knee': -1}, **(signs or {}))
+        self.tempo = tempo
+        self.hold_seconds = hold_seconds
+
+
+MOTIONS = {
+    'bicep': Motion({'elbow': 170, 'shoulder': 10, 'hip': 178, 'knee': 178}, [({'elbow': 30}, None)],
+                    bad={'shoulder': 45}, bad_counts=False, signs={'elbow': -1}),
+    'pullup': Motion({'elbow': 170, 'shoulder': 165, 'hip': 175, 'knee': 170}, [({'elbow': 20}, None)]),
+    'jumping_jack': Motion({'elbow': 175, 'shoulder': 10, 'hip': 180, 'knee': 178},
+                           [({'shoulder': 160, 'hip': 155}, None)], partial=0.2, tempo=0.4),
+    'bench_press': Motion({'elbow': 170, 'shoulder': 90, 'hip': 175, 'knee': 100}, [({'elbow': 80}, None)],
+                          lean=90, view='side', bad={'elbow': 30}, signs={'shoulder': -1}),
+    'pushup': Motion({'elbow': 170, 'shoulder': 75, 'hip': 175, 'knee': 178}, [({'elbow': 70}, None)],
+                     lean=80, view='side', bad={'elbow': 15}),
+    'crunches': Motion({'elbow': 60, 'shoulder': 150, 'hip': 110, 'knee': 70}, [({'hip': 70}, None)],
+                       lean=-90, view='side'),
+    'plank': Motion({'elbow': 90, 'shoulder': 80, 'hip': 170, 'knee': 175}, [({'hip': 100, 'knee': 100}, None)],
+                    lean=80, view='side', bad={'elbow': 30, 'hip': 80}, bad_counts=False, hold_seconds=5),
+    'leg_raise': Motion({'elbow': 175, 'shoulder': 20, 'hip': 175, 'knee': 178}, [({'hip': 80}, None)],
+                        lean=-90, view='side', bad={'hip': 80, 'knee': 40}),
+    'lunges': Motion({'elbow': 175, 'shoulder': 15, 'hip': 178, 'knee': 178},
+                     [({'left_knee': 90, 'right_knee': 150, 'left_hip': 100}, ('left',)),
+                      ({'right_knee': 90, 'left_knee': 150, 'right_hip': 100}, ('right',))],
+                     view='side'),
+    'squat': Motion({'elbow': 175, 'shoulder': 20, 'hip': 175, 'knee': 175}, [({'knee': 75, 'hip': 80}, None)],
+                    view='side', bad={'knee': 30, 'hip': 45}),
+    'lateral_raise': Motion({'elbow': 170, 'shoulder': 10, 'hip': 178, 'knee': 178}, [({'shoulder': 85}, None)],
+                            bad={'shoulder': 110}),
+    'shoulder_press': Motion({'elbow': 165, 'shoulder': 160, 'hip': 178, 'knee': 178},
+                             [({'elbow': 80, 'shoulder': 70}, None)], bad={'elbow': 80, 'shoulder': 55}),
+}
+
+
+def rotate(v, degrees):
+    theta = np.radians(degrees)
+    cos, sin = np.cos(theta), np.sin(theta)
+    return np.stack([v[..., 0] * cos - v[..., 1] * sin, v[..., 0] * sin + v[..., 1] * cos], axis=-1)
+
+
+def pose_figure(params, lean, view, signs):
+    """
+    (frames, 33, 2) image positions of the figure for per-frame joint angle
+    arrays in params (see expand()), a torso lean in degrees and the
+    direction each joint bends in.
+    """
+    frames = len(params['left_elbow'])
+    lean = np.radians(np.broadcast_to(lean, (frames,)))
+    up = np.stack([np.sin(lean), -np.cos(lean)], axis=-1)
+    across = np.stack([np.cos(lean), np.sin(lean)], axis=-1)
+    lying = np.abs(np.sin(lean))[:, None]
+    # Standing figures stand in the middle of the frame, lying ones lower down
+    hip_center = np.array([0.5, 0.55]) + lying * [-0.1, 0.2]
+    half_hips, half_shoulders = (0.05, 0.08) if view == 'front' else (0.005, 0.005)
+
+    xy = np.zeros((frames, NUM_LANDMARKS, 2))
+
+    def put(name, value):
+        xy[:, LANDMARK_INDEX[name]] = value
+
+    for side, out in (('left', 1), ('right', -1)):
+        name = side.upper()
+        # Seen from the front, limbs of the two sides move in mirror image
+        mirror = out if view == 'front' else 1
+        hip = hip_center + out * half_hips * across
+        shoulder = hip + TORSO * up + out * (half_shoulders - half_hips) * across
+        # Limbs are placed from the side's own hip to shoulder line, which
+        # the wider shoulders tilt away from up
+        torso = (shoulder - hip) / np.linalg.norm(shoulder - hip, axis=-1, keepdims=True)
+        arm = rotate(-torso, -mirror * signs['shoulder'] * params[side + '_shoulder'])
+        elbow = shoulder + UPPER_ARM * arm
+        forearm = rotate(-arm, mirror * signs['elbow'] * params[side + '_elbow'])
+        wrist = elbow + FOREARM * forearm
+        thigh = rotate(torso, mirror * signs['hip'] * params[side + '_hip'])
+        knee = hip + THIGH * thigh
+        shin = rotate(-thigh, mirror * signs['knee'] * params[side + '_knee'])
+        ankle = knee + SHIN * shin
+        foot = rotate(shin, -90 * mirror)
+
+        put(name + '_SHOULDER', shoulder)
+        put(name + '_ELBOW', elbow)
+        put(name + '_WRIST', wrist)
+        put(name + '_HIP', hip)
+        put(name + '_KNEE', knee)
+        put(name + '_ANKLE', ankle)
+        put(name + '_PINKY', wrist + 0.03 * rotate(forearm, 15))
+        put(name + '_INDEX', wrist + 0.035 * forearm)
+        put(name + '_THUMB', wrist + 0.025 * rotate(forearm, -25))
+        put(name + '_HEEL', ankle - 0.015 * foot)
+        put(name + '_FOOT_INDEX', ankle + 0.05 * foot)
+
+    neck = (xy[:, LANDMARK_INDEX['LEFT_SHOULDER']] + xy[:, LANDMARK_INDEX['RIGHT_SHOULDER']]) / 2
+    nose = neck + 0.09 * up
+    put('NOSE', nose)
+    for name, offset in (('EYE_INNER', 0.01), ('EYE', 0.02), ('EYE_OUTER', 0.03), ('EAR', 0.045)):
+        put('LEFT_' + name, nose + 0.015 * up + offset * across)
+        put('RIGHT_' + name, nose + 0.015 * up - offset * across)
+    put('MOUTH_LEFT', nose - 0.02 * up + 0.012 * across)
+    put('MOUTH_RIGHT', nose - 0.02 * up - 0.012 * across)
+    return xy
+
+
+def ease(frames):
+    """
+    0 to 1 over frames, starting and ending slowly.
+    """
+    return (1 - np.cos(np.linspace(0, np.pi, frames))) / 2 if frames > 1 else np.ones(frames)
+
+
+class SyntheticSequence:
+    """
+    A generated landmark sequence: points (frames, 33, 4), frame times t,
+    valid (False for dropped frames, whose points are NaN), and what
+    counting it should give: expected counts per track, the form warnings
+    it should raise, and the kind of every rep ('full', 'partial' or 'bad').
+    """
+    def __init__(self, exercise, points, t, valid, expected, warnings, reps):
+        self.exercise = exercise
+        self.points = points
+        self.t = t
+        self.valid = valid
+        self.expected = expected
+        self.warnings = warnings
+        self.reps = reps
+
+    def __len__(self):
+        return len(self.t)
+
+    def save(self, path, **meta):
+        """
+        Write the sequence out as a landmark recording (see recording.py).
+        """
+        with LandmarkRecorder(path, exercise=self.exercise, synthetic=True, expected=self.expected,
+                              **meta) as recorder:
+            for points, t, valid in zip(self.points, self.t, self.valid):
+                recorder.add(points if valid else None, t)
+
+
+def generate(exercise, reps=10, fps=30.0, seed=0, noise=0.002, dropout=0.0, partial=0.0, bad=0.0,
+             tempo=None, pause=0.3):
+    """
+    A SyntheticSequence of reps repetitions of exercise at fps frames per
+    second. noise is the standard deviation of the landmark jitter (in
+    frame heights), dropout the share of frames where nobody is detected,
+    and partial and bad the shares of partial and bad-form reps. tempo is
+    the seconds each half of a rep takes, jittered by up to 20% per rep,
+    and pause the seconds spent at rest between reps. The same arguments
+    always give the same sequence.
+    """
+    motion = MOTIONS[exercise]
+    spec = EXERCISES[exercise]
+    rng = np.random.default_rng(seed)
+    tempo = motion.tempo if tempo is None else tempo
+    tracks = [track.name for track in spec.tracks]
+    hold = spec.counting == 'hold'
+
+    segments, in_hold, kinds, expected_reps = [], [], [], {name: 0 for name in tracks}
+    warnings = set()
+    bad_check = spec.form_checks[0].message if spec.form_checks else None
+
+    def stay(pose, seconds):
+        frames = max(1, int(round(seconds * fps)))
+        segments.append({key: np.full(frames, value, np.float64) for key, value in pose.items()})
+        # For holds, the rest pose is the position held
+        in_hold.append(np.full(frames, hold and pose is motion.rest))
+
+    def move(start, end, seconds):
+        frames = max(2, int(round(seconds * fps)))
+        w = ease(frames)
+        segments.append({key: start[key] + w * (end[key] - start[key]) for key in start})
+        in_hold.append(np.zeros(frames, bool))
+
+    stay(motion.rest, pause)
+    for rep in range(reps):
+        draw = rng.random()
+        kind = 'partial' if draw < partial else 'bad' if draw < partial + bad and motion.bad else 'full'
+        peak, peak_tracks = motion.peaks[rep % len(motion.peaks)]
+        if kind == 'bad':
+            peak = {key: peak[key] if value is None else value for key, value in expand(motion.bad).items()}
+            warnings.add(bad_check)
+        elif kind == 'partial' and not hold:
+            peak = {key: motion.rest[key] + motion.partial * (peak[key] - motion.rest[key]) for key in peak}
+        kinds.append(kind)
+        if kind == 'full' or kind == 'bad' and motion.bad_counts:
+            for name in peak_tracks or tracks:
+                expected_reps[name] += 1
+
+        down, up = tempo * rng.uniform(0.8, 1.2, 2)
+        if hold:
+            # Into and out of position in one frame, so that jitter on the
+            # way through the hold's limits does not blur the seconds held
+            duration = motion.hold_seconds * rng.uniform(0.8, 1.2)
+            stay(motion.rest, duration * motion.partial if kind == 'partial' else duration)
+            stay(peak, down + up)
+        else:
+            move(motion.rest, peak, down)
+            stay(peak, pause / 2)
+            move(peak, motion.rest, up)
+            stay(motion.rest, pause * rng.uniform(0.5, 1.5))
+
+    params = {key: np.concatenate([segment[key] for segment in segments]) for key in motion.rest}
+    frames = len(params['left_elbow'])
+    t = np.arange(frames) / fps
+    xy = pose_figure(params, motion.lean, motion.view, motion.signs)
+
+    points = np.empty((frames, NUM_LANDMARKS, 4), np.float32)
+    points[..., :2] = xy + rng.normal(0, noise, xy.shape)
+    points[..., 2] = rng.normal(0, 0.02, (frames, NUM_LANDMARKS))
+    points[..., 3] = rng.uniform(0.85, 1.0, (frames, NUM_LANDMARKS))
+    valid = rng.random(frames) >= dropout
+    points[~valid] = np.nan
+
+    if hold:
+        # Seconds scheduled in the hold pose, added up as the counter does:
+        # between consecutive frames that are both detected and held
+        held = np.concatenate(in_hold) & valid
+        seconds = float(np.sum(np.diff(t)[held[1:] & held[:-1]]))
+        expected_reps = {'total': int(seconds)}
+    return SyntheticSequence(exercise, points, t, valid, expected_reps, sorted(w for w in warnings if w), kinds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('exercise', choices=sorted(EXERCISES))
+    parser.add_argument('output', help="recording directory to write")
+    parser.add_argument('--reps', type=int, default=10)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--noise', type=float, default=0.002)
+    parser.add_argument('--dropout', type=float, default=0.0, help="share of frames with nobody detected")
+    parser.add_argument('--partial', type=float, default=0.0, help="share of partial reps")
+    parser.add_argument('--bad', type=float, default=0.0, help="share of reps with bad form")
+    args = parser.parse_args()
+
+    sequence = generate(args.exercise, args.reps, args.fps, args.seed, args.noise, args.dropout, args.partial,
+                        args.bad)
+    sequence.save(args.output, seed=args.seed)
+    print(json.dumps({'recording': args.output, 'frames': len(sequence), 'expected': sequence.expected,
+                      'warnings': sequence.warnings}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Durations of one processing stage. Keeps the most recent samples for
+    percentiles and running totals for the mean and the stage's own frame rate.
+    """
+    def __init__(self, samples=2048):
+        self.durations = np.zeros(samples)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.durations[self.count % len(self.durations)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def since(self, start):
+        """
+        Record the time elapsed since a time.perf_counter() reading.
+        """
+        self.add(time.perf_counter() - start)
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        p50, p95, p99 = np.percentile(self.durations[:min(self.count, len(self.durations))], [50, 95, 99]) * 1000
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'fps': self.count / self.total if self.total else 0.0,
+        }
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from website_folder.python.engine.buffers import FramePool
+from website_folder.python.engine.pipeline import LatestQueue
+from website_folder.python.engine.timing import StageTimer
+
+# About a second of frames waiting to be encoded before the oldest are dropped
+QUEUE_SIZE = 30
+
+
+class VideoRecorder:
+    """
+    Writes annotated frames to an MJPG .avi on a thread of its own, so
+    encoding never holds up the loop that draws them. add() copies each
+    frame, scaled to width (None keeps its size), into one of the
+    recorder's own buffers and queues it. When the writer falls behind, the
+    oldest queued frames are dropped rather than add() waiting, and once
+    the writer has failed add() drops every frame.
+    Frames are placed in the video by their time, so it plays in real time
+    at fps whatever rate they are drawn at: a frame is repeated until the
+    next one is due, and one due in the same 1/fps slot as the last is
+    skipped.
+    """
+    def __init__(self, path, fps=30.0, width=None, quality=75, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+        self.size = None
+        # One buffer per queued frame, plus the one being encoded
+        self.buffers = FramePool(queue_size + 1)
+        self.queue = LatestQueue(queue_size, on_drop=lambda item: self.buffers.release(item[0]))
+        self.start = None
+        # The last slot queued, and the last written: one slot per 1/fps
+        self.slot = -1
+        self.written = -1
+        self.frames = 0
+        self.recorded = 0
+        self.repeated = 0
+        self.skipped = 0
+        self.error = None
+        self.scale = StageTimer()
+        self.encode = StageTimer()
+        self.thread = threading.Thread(target=self.write, name='video-recorder', daemon=True)
+        self.thread.start()
+
+    def add(self, frame, t=None):
+        """
+        Queue a frame drawn at time t, in seconds on any clock. Without t
+        every frame takes the next slot.
+        """
+        self.frames += 1
+        if self.error:
+            return
+        if t is None:
+            slot = self.slot + 1
+        else:
+            if self.start is None:
+                self.start = t
+            slot = int(round((t - self.start) * self.fps))
+        if slot <= self.slot:
+            self.skipped += 1
+            return
+        self.slot = slot
+        started = time.perf_counter()
+        if self.size is None:
+            height, width = frame.shape[:2]
+            if self.width and self.width < width:
+                # Even sizes, which every player can decode
+                width, height = self.width // 2 * 2, int(height * self.width / width) // 2 * 2
+            self.size = (width, height)
+        buffer = self.buffers.acquire()
+        if buffer is None or buffer.shape[1::-1] != self.size:
+            buffer = np.empty((self.size[1], self.size[0], 3), np.uint8)
+        if frame.shape[1::-1] == self.size:
+            np.copyto(buffer, frame)
+        else:
+            cv2.resize(frame, self.size, dst=buffer, interpolation=cv2.INTER_AREA)
+        self.queue.put((buffer, slot))
+        self.scale.since(started)
+
+    def write(self):
+        writer = None
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                frame, slot = item
+                started = time.perf_counter()
+                if writer is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    # OpenCV's own MJPG writer, the one that takes a quality
+                    writer = cv2.VideoWriter(self.path, cv2.CAP_OPENCV_MJPEG, cv2.VideoWriter_fourcc(*'MJPG'),
+                                             self.fps, frame.shape[1::-1])
+                    if not writer.isOpened():
+                        raise OSError("cannot write %s" % self.path)
+                    writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.quality)
+                # Frames dropped from the queue leave a longer gap to fill
+                for _ in range(slot - self.written):
+                    writer.write(frame)
+                self.repeated += slot - self.written - 1
+                self.written = slot
+                self.buffers.release(frame)
+                self.recorded += 1
+                self.encode.since(started)
+        except Exception as error:
+            # Losing the video must not end the session; add() keeps dropping
+            self.error = '%s: %s' % (type(error).__name__, error)
+            self.queue.close()
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def close(self):
+        """
+        Write out the frames still queued and finish the file.
+        """
+        self.queue.close()
+        self.thread.join()
+
+    def stats(self):
+        # Frames still queued will be written, unless the writer has stopped
+        queued = len(self.queue.items) if self.thread.is_alive() else 0
+        return {
+            'path': self.path,
+            'size': self.size,
+            'fps': self.fps,
+            'quality': self.quality,
+            'frames': self.frames,
+            'recorded': self.recorded,
+            'repeated': self.repeated,
+            'skipped': self.skipped,
+            'dropped': self.frames - self.recorded - self.skipped - queued,
+            'error': self.error,
+            'scale': self.scale.summary(),
+            'encode': self.encode.summary(),
+        }
+
+
+def source_fps(cap):
+    """
+    The frame rate a CaptureSource delivers: measured over its reads so far,
+    else the one it negotiated, else None when it reports neither.
+    """
+    report = cap.report()
+    return report['measured_fps'] or report['negotiated']['fps'] or None
+
+
+class VideoSettings:
+    """
+    Where and how sessions record their annotated video, from the app config.
+    Without a directory, sessions are not recorded. Videos play at the frame
+    rate of the source they were captured from (see source_fps), or at fps
+    when it reports none.
+    """
+    def __init__(self, directory=None, fps=30.0, width=640, quality=75, queue_size=QUEUE_SIZE):
+        self.directory = directory
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+        self.queue_size = queue_size
+
+    def init_app(self, app):
+        self.directory = app.config.get('SESSION_VIDEO_DIR', self.directory)
+        self.fps = app.config.get('SESSION_VIDEO_FPS', self.fps)
+        self.width = app.config.get('SESSION_VIDEO_WIDTH', self.width)
+        self.quality = app.config.get('SESSION_VIDEO_QUALITY', self.quality)
+        self.queue_size = app.config.get('SESSION_VIDEO_QUEUE', self.queue_size)
+
+    def create(self, name, fps=None):
+        if not self.directory:
+            return None
+        path = os.path.join(self.directory, '%s-%s.avi' % (name, time.strftime('%Y%m%d-%H%M%S')))
+        return VideoRecorder(path, fps or self.fps, self.width, self.quality, self.queue_size)
+
+
+session_video = VideoSettings()
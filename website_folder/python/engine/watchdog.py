@@ -0,0 +1,100 @@
+import collections
+import threading
+import time
+
+# Reasons a session is ended by its watchdog
+IDLE, MAX_DURATION, READ_FAILURES = 'idle', 'max_duration', 'read_failures'
+
+
+class Watchdog:
+    """
+    Limits of one session: it is reaped once nobody has been seen for
+    idle_timeout seconds, once it has run for max_duration seconds, or after
+    max_read_failures frames in a row could not be read. None disables a
+    limit. Times come from clock, not from the frames.
+    """
+    def __init__(self, supervisor, idle_timeout=None, max_duration=None, max_read_failures=None,
+                 clock=time.monotonic):
+        self.supervisor = supervisor
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.max_read_failures = max_read_failures
+        self.clock = clock
+        self.started = self.last_seen = clock()
+        self.failures = 0
+        self.reason = None
+
+    def read(self, ok):
+        """
+        Record whether a frame could be read. False once too many failed in a row.
+        """
+        self.failures = 0 if ok else self.failures + 1
+        if self.max_read_failures is not None and self.failures >= self.max_read_failures:
+            self.reap(READ_FAILURES)
+        return self.reason is None
+
+    def seen(self, person):
+        if person:
+            self.last_seen = self.clock()
+
+    def check(self):
+        """
+        Reason the session has to end, or None while it is within its limits.
+        """
+        if self.reason is None:
+            now = self.clock()
+            if self.max_duration is not None and now - self.started >= self.max_duration:
+                self.reap(MAX_DURATION)
+            elif self.idle_timeout is not None and now - self.last_seen >= self.idle_timeout:
+                self.reap(IDLE)
+        return self.reason
+
+    def reap(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            self.supervisor.reaped(reason)
+
+    def summary(self):
+        return {
+            'reaped': self.reason,
+            'elapsed': self.clock() - self.started,
+            'idle': self.clock() - self.last_seen,
+        }
+
+
+class Supervisor:
+    """
+    Session limits from the app config, and how many sessions were reaped
+    for each reason.
+    """
+    def __init__(self, idle_timeout=120, max_duration=3600, max_read_failures=30):
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.max_read_failures = max_read_failures
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.idle_timeout = app.config.get('SESSION_IDLE_TIMEOUT', self.idle_timeout)
+        self.max_duration = app.config.get('SESSION_MAX_DURATION', self.max_duration)
+        self.max_read_failures = app.config.get('SESSION_MAX_READ_FAILURES', self.max_read_failures)
+
+    def watch(self, clock=time.monotonic):
+        return Watchdog(self, self.idle_timeout, self.max_duration, self.max_read_failures, clock)
+
+    def reaped(self, reason):
+        with self.lock:
+            self.counts[reason] += 1
+
+    def stats(self):
+        with self.lock:
+            reaped = {reason: self.counts[reason] for reason in (IDLE, MAX_DURATION, READ_FAILURES)}
+        return {
+            'idle_timeout': self.idle_timeout,
+            'max_duration': self.max_duration,
+            'max_read_failures': self.max_read_failures,
+            'reaped': reaped,
+        }
+
+
+supervisor = Supervisor()
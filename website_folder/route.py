@@ -1,5 +1,6 @@
+import json
 from datetime import datetime
-from flask import Flask, render_template, url_for, flash, redirect, request, jsonify
+from flask import Flask, render_template, url_for, flash, redirect, request, jsonify, abort, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from website_folder.forms import RegistrationForm, LoginForm, UpdateAccountForm, ResetForm, ResetPasswordForm
 from website_folder import app, db, bcrypt, mail
@@ -7,18 +8,9 @@ from website_folder.models import User, CalculationResult
 from flask_login import login_user, current_user, logout_user, login_required, LoginManager
 from flask_bcrypt import Bcrypt
 from flask_mail import Message
-from website_folder.python.ARM.bicep import bicep_exercise
-from website_folder.python.BACK.pullups import pullup_exercise
-from website_folder.python.CARDIO.jumping_jack import jumping_jack_exercise
-from website_folder.python.CHEST.bench_press import bench_press_exercise
-from website_folder.python.CHEST.pushup import pushup_exercise
-from website_folder.python.CORE.crunches import crunches_exercise
-from website_folder.python.CORE.plank import plank_exercise
-from website_folder.python.LEG.leg_raise import leg_raise_exercise
-from website_folder.python.LEG.lunges import lunges_exercise
-from website_folder.python.LEG.Squat import squat_exercise
-from website_folder.python.SHOULDER.lateral_raise import lateral_raise_exercise
-from website_folder.python.SHOULDER.shoulder_press import shoulder_press_exercise
+from website_folder.python.engine.jobs import jobs, JobRejected
+from website_folder.python.engine.pool import PoolExhausted
+from website_folder.python.engine.session import sessions, read_frames, FrameError, parse_landmarks_json, parse_landmarks_binary
 from website_folder.Calculator.calci import calculate_bmi, calculate_bmr, calculate_ideal_weight, calculate_body_fat, calculate_lean_body_mass, calculate_waist_to_hip_ratio, calculate_waist_to_height_ratio, calculate_protein_intake, calculate_calorie_intake, calculate_fat_intake, calculate_carbohydrate_intake, calculate_water_intake, calculate_tdee
 
 
@@ -163,137 +155,251 @@ def melobot():
         return jsonify({'response': response})
     return render_template('melobot.html')
 
-@app.route("/bicep-exercise", methods=["GET", "POST"])
-@login_required
-def bicep_exercise_route():
+def start_exercise_job(exercise, submit=jobs.submit):
+    # The webcam session runs on the job pool, so the request returns at once
     if request.method == "POST":
         num_reps = int(request.form.get("num_reps", 0))
         if num_reps > 0:
-            bicep_exercise(num_reps)
+            try:
+                job = submit(exercise, num_reps, current_user.get_id())
+            except KeyError:
+                flash("Please choose an exercise.", "error")
+                return render_template("exercise.html"), 400
+            except JobRejected as e:
+                flash(str(e), "error")
+                return render_template("exercise.html"), 503
+            if request.accept_mimetypes.best == "application/json":
+                return jsonify(job.summary()), 202
+            return render_template("exercise.html", job=job.summary()), 202
         else:
             flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html") 
+    return render_template("exercise.html")
+
+@app.route("/bicep-exercise", methods=["GET", "POST"])
+@login_required
+def bicep_exercise_route():
+    return start_exercise_job("bicep")
 
 @app.route("/pullup-exercise", methods=["GET", "POST"])
 @login_required
 def pullup_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            pullup_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("pullup")
 
 @app.route("/jumping-jack-exercise", methods=["GET", "POST"])
 @login_required
 def jumping_jack_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            jumping_jack_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("jumping_jack")
 
 @app.route("/bench-press-exercise", methods=["GET", "POST"])
 @login_required
 def bench_press_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            bench_press_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("bench_press")
 
 @app.route("/pushup-exercise", methods=["GET", "POST"])
 @login_required
 def pushup_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            pushup_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("pushup")
 
 @app.route("/crunches-exercise", methods=["GET", "POST"])
 @login_required
 def crunches_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            crunches_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("crunches")
 
 @app.route("/plank-exercise", methods=["GET", "POST"])
 @login_required
 def plank_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            plank_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("plank")
 
 @app.route("/leg-raise-exercise", methods=["GET", "POST"])
 @login_required
 def leg_raise_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            leg_raise_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("leg_raise")
 
 @app.route("/lunges-exercise", methods=["GET", "POST"])
 @login_required
 def lunges_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            lunges_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("lunges")
 
 @app.route("/squat-exercise", methods=["GET", "POST"])
 @login_required
 def squat_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            squat_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("squat")
 
 @app.route("/lateral-raise-exercise", methods=["GET", "POST"])
 @login_required
 def lateral_raise_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            lateral_raise_exercise(num_reps)
-        else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+    return start_exercise_job("lateral_raise")
 
 @app.route("/shoulder-press-exercise", methods=["GET", "POST"])
 @login_required
 def shoulder_press_exercise_route():
-    if request.method == "POST":
-        num_reps = int(request.form.get("num_reps", 0))
-        if num_reps > 0:
-            shoulder_press_exercise(num_reps)
+    return start_exercise_job("shoulder_press")
+
+@app.route("/class-exercise", methods=["GET", "POST"])
+@login_required
+def class_exercise_route():
+    # Everyone in front of the camera does the chosen exercise, counted one by one
+    return start_exercise_job(request.form.get("exercise"), jobs.submit_class)
+
+def json_target(data):
+    target = int(data.get("target", 0))
+    if target <= 0:
+        raise ValueError
+    return target
+
+def submit_json_job(submit, error):
+    # submit(data, owner) queues a job from the JSON body; KeyError, TypeError
+    # and ValueError from it mean the body was invalid and answer with error
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify(error="The request body must be a JSON object."), 400
+    try:
+        job = submit(data, current_user.get_id())
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error=error), 400
+    except JobRejected as e:
+        return jsonify(error=str(e)), 503
+    response = jsonify(job.summary())
+    response.headers["Location"] = url_for("exercise_job", job_id=job.id)
+    return response, 202
+
+@app.route("/exercise/jobs", methods=["GET", "POST"])
+@login_required
+def exercise_jobs():
+    if request.method == "GET":
+        return jsonify(jobs=[job.summary() for job in jobs.list(current_user.get_id())], stats=jobs.stats())
+    # {"exercise": "squat", "target": 10}
+    return submit_json_job(lambda data, owner: jobs.submit(data.get("exercise"), json_target(data), owner),
+                           "Unknown exercise or invalid target.")
+
+@app.route("/exercise/circuits", methods=["POST"])
+@login_required
+def exercise_circuits():
+    # {"steps": [{"exercise": "pushup", "target": 10}, ...]}, run as one job
+    return submit_json_job(lambda data, owner: jobs.submit_circuit(data.get("steps") or [], owner),
+                           "Unknown exercise or invalid circuit.")
+
+@app.route("/exercise/classes", methods=["POST"])
+@login_required
+def exercise_classes():
+    # {"exercise": "squat", "target": 10}, counted for each person in view
+    return submit_json_job(lambda data, owner: jobs.submit_class(data.get("exercise"), json_target(data), owner),
+                           "Unknown exercise or invalid target.")
+
+def event_stream(channel):
+    # Server-Sent Events; Last-Event-ID lets a reconnecting browser resume
+    try:
+        last_id = int(request.headers.get("Last-Event-ID"))
+    except (TypeError, ValueError):
+        last_id = None
+    return Response(stream_with_context(channel.stream(last_id)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/exercise/jobs/<job_id>/events")
+@login_required
+def exercise_job_events(job_id):
+    job = jobs.get(job_id, current_user.get_id())
+    if job is None:
+        abort(404)
+    return event_stream(job.events)
+
+@app.route("/exercise/jobs/<job_id>", methods=["GET", "DELETE"])
+@login_required
+def exercise_job(job_id):
+    if request.method == "DELETE":
+        job = jobs.cancel(job_id, current_user.get_id())
+    else:
+        job = jobs.get(job_id, current_user.get_id())
+    if job is None:
+        abort(404)
+    return jsonify(job.summary())
+
+@app.route("/live-exercise")
+@login_required
+def live_exercise():
+    return render_template("live_exercise.html", title='Live Exercise')
+
+@app.route("/pose/sessions", methods=["POST"])
+@login_required
+def create_pose_session():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify(error="The request body must be a JSON object."), 400
+    try:
+        target = json_target(data)
+        # "input": "landmarks" for clients that run pose detection themselves
+        if data.get("input", "frames") not in ("frames", "landmarks"):
+            raise ValueError
+        inference = data.get("input", "frames") == "frames"
+        session = sessions.create(data.get("exercise"), target, app.config['POSE_POOL_TIMEOUT'], inference,
+                                   current_user.get_id())
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="Unknown exercise, input or invalid target."), 400
+    except PoolExhausted as e:
+        return jsonify(error=str(e)), 503
+    return jsonify(session_id=session.id), 201
+
+@app.route("/pose/sessions/<session_id>", methods=["GET", "DELETE"])
+@login_required
+def pose_session(session_id):
+    if request.method == "DELETE":
+        session = sessions.close(session_id, current_user.get_id())
+    else:
+        session = sessions.get(session_id, current_user.get_id())
+    if session is None:
+        abort(404)
+    return jsonify(session.summary())
+
+@app.route("/pose/sessions/<session_id>/frames", methods=["POST"])
+@login_required
+def pose_session_frames(session_id):
+    session = sessions.get(session_id, current_user.get_id())
+    if session is None:
+        abort(404)
+
+    # A single JPEG gets a single JSON state back
+    if request.mimetype == "image/jpeg":
+        try:
+            return jsonify(session.process_jpeg(request.get_data()))
+        except FrameError as e:
+            return jsonify(error=str(e)), 400
+
+    # A length-prefixed stream of JPEGs gets one JSON line back per frame
+    def generate():
+        try:
+            for data in read_frames(request.stream):
+                yield json.dumps(session.process_jpeg(data)) + "\n"
+        except FrameError as e:
+            yield json.dumps({'error': str(e)}) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/pose/sessions/<session_id>/landmarks", methods=["POST"])
+@login_required
+def pose_session_landmarks(session_id):
+    session = sessions.get(session_id, current_user.get_id())
+    if session is None:
+        abort(404)
+    try:
+        if request.is_json:
+            points, t = parse_landmarks_json(request.get_json(silent=True))
         else:
-            flash("Please enter a valid number of reps.", "error")
-    return render_template("exercise.html")
+            points, t = parse_landmarks_binary(request.get_data())
+        return jsonify(session.process_landmarks(points, t))
+    except FrameError as e:
+        return jsonify(error=str(e)), 400
+
+@app.route("/pose/sessions/<session_id>/events")
+@login_required
+def pose_session_events(session_id):
+    session = sessions.get(session_id, current_user.get_id())
+    if session is None:
+        abort(404)
+    return event_stream(session.events)
+
+@app.route("/pose/stats")
+@login_required
+def pose_stats():
+    return jsonify(sessions.stats())
 
 @app.route('/calculate', methods=['GET', 'POST'])
 @login_required